@@ -1,29 +1,126 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
-from rest_framework.decorators import action, api_view, permission_classes
-from django.http import FileResponse, JsonResponse
-from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.throttling import UserRateThrottle
+from rest_framework.utils.encoders import JSONEncoder
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.cache import cache
+from django.http import Http404
+from django.db.models import Count
 import os
 import logging
 import json
+import hashlib
 
 from .models import Document, DocumentChunk
 from recorder.models import Campaign
-from .serializers import DocumentSerializer, DocumentDetailSerializer, DocumentSearchResultSerializer
+from .serializers import (
+    DocumentSerializer,
+    DocumentListSerializer,
+    DocumentDetailSerializer,
+    DocumentSummarySerializer,
+    DocumentSearchResultSerializer
+)
 from .services import DocumentService
-from .exceptions import DocumentProcessingError, DocumentNotFoundException
+from .exceptions import DocumentProcessingError
 from .vector_store import ChromaVectorStore
+from .signals import CAMPAIGN_OWNER_CACHE_KEY, get_search_cache_version
+from .throttles import UploadRateThrottle
+from .mixins import AutoPrefetchViewSetMixin
 
 logger = logging.getLogger(__name__)
 
-class DocumentViewSet(viewsets.ModelViewSet):
+# How long a campaign's owner stays cached (in seconds)
+CAMPAIGN_OWNER_CACHE_TTL = 300
+
+def get_campaign_owner_id(campaign_id):
+    """
+    Get the user ID owning a campaign, cached to skip the Campaign query
+    
+    Raises:
+        Http404: If the campaign does not exist
+    """
+    key = CAMPAIGN_OWNER_CACHE_KEY.format(campaign_id)
+    owner_id = cache.get(key)
+    if owner_id is None:
+        try:
+            owner_id = Campaign.objects.values_list('user_id', flat=True).get(pk=campaign_id)
+        except Campaign.DoesNotExist:
+            raise Http404("Campaign not found")
+        cache.set(key, owner_id, CAMPAIGN_OWNER_CACHE_TTL)
+    return owner_id
+
+# Uploads retried with the same Idempotency-Key within this window return the first response
+IDEMPOTENCY_TTL = 3600
+IDEMPOTENCY_PENDING = 'pending'
+
+# How long search responses stay cached (in seconds)
+SEARCH_CACHE_TTL = 60
+
+def cached_search(user, query, campaign_id, limit):
+    """
+    Run DocumentService.search_documents, caching the results per user and query
+    
+    The key includes the campaign's search cache version, which is bumped
+    whenever a document is saved, deleted or changes status (see signals.py).
+    
+    Args:
+        user: User running the search
+        query (str): Search query
+        campaign_id: Optional campaign ID filter
+        limit (int): Maximum number of results
+        
+    Returns:
+        list: Search results
+    """
+    digest = hashlib.sha256(f"{query}\0{campaign_id}\0{limit}".encode('utf-8')).hexdigest()
+    key = f'search:{user.id}:{get_search_cache_version(campaign_id)}:{digest}'
+    results = cache.get(key)
+    if results is None:
+        results = DocumentService.search_documents(
+            query_text=query,
+            campaign_id=campaign_id,
+            limit=limit
+        )
+        cache.set(key, results, SEARCH_CACHE_TTL)
+    return results
+
+def stream_serialized_list(queryset, serializer_class, chunk_size=200):
+    """
+    Stream a queryset as a JSON array, serializing one row at a time
+    
+    Rows are read with iterator() so neither the ORM result cache nor the
+    full serialized list is held in memory. One serializer instance renders
+    every row, so its fields are only built once.
+    """
+    def generate():
+        serializer = serializer_class()
+        yield b'['
+        for idx, instance in enumerate(queryset.iterator(chunk_size=chunk_size)):
+            if idx:
+                yield b','
+            yield json.dumps(serializer.to_representation(instance), cls=JSONEncoder).encode('utf-8')
+        yield b']'
+    
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+class DocumentViewSet(AutoPrefetchViewSetMixin, viewsets.ModelViewSet):
     """
     API endpoints for document management
     """
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [UserRateThrottle]
+    
+    def get_throttles(self):
+        """Apply the stricter upload limit to document creation"""
+        throttles = super().get_throttles()
+        if self.action == 'create':
+            throttles.append(UploadRateThrottle())
+        return throttles
     
     def get_queryset(self):
         """Filter documents to only show those belonging to the current user"""
@@ -32,16 +129,33 @@ class DocumentViewSet(viewsets.ModelViewSet):
         # Get campaign_id from query params if provided
         campaign_id = self.request.query_params.get('campaign_id')
         
-        queryset = Document.objects.filter(
-            Q(uploaded_by=user) | Q(campaign__user=user)
-        ).select_related('campaign')
+        # Documents the user uploaded, plus ones in their campaigns uploaded by
+        # someone else. A UNION of the two lets each side use its own index,
+        # where an OR across the two foreign keys can't.
+        own = Document.objects.filter(uploaded_by=user)
+        via = Document.objects.filter(campaign__user=user).exclude(uploaded_by=user)
         
         # Further filter by campaign if campaign_id is provided
         if campaign_id:
-            queryset = queryset.filter(campaign_id=campaign_id)
-            
+            own = own.filter(campaign_id=campaign_id)
+            via = via.filter(campaign_id=campaign_id)
+        
+        # The legs are disjoint, so skip UNION's dedup. Wrapping the union in
+        # pk__in keeps the queryset filterable for get_object().
+        matching_ids = own.order_by().values('pk').union(via.order_by().values('pk'), all=True)
+        
+        # Related rows the serializer reads are joined by AutoPrefetchViewSetMixin
+        queryset = Document.objects.filter(pk__in=matching_ids)
+        if self.action == 'list':
+            # One aggregate JOIN instead of a COUNT query per document
+            queryset = queryset.annotate(chunk_count=Count('chunks'))
         return queryset
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return DocumentListSerializer
+        return super().get_serializer_class()
+    
     def perform_create(self, serializer):
         """Set the uploaded_by field to the current user when creating a document"""
         # Get the file, title, description from the request
@@ -56,13 +170,10 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         campaign = None
         if campaign_id:
-            try:
-                campaign = Campaign.objects.get(id=campaign_id)
-                # Ensure the user has access to this campaign
-                if campaign.user != self.request.user:
-                    raise PermissionError("You do not have permission to add documents to this campaign")
-            except Campaign.DoesNotExist:
-                pass
+            # One lookup filtered by owner; only check existence when it misses
+            campaign = Campaign.objects.filter(id=campaign_id, user=self.request.user).first()
+            if campaign is None and Campaign.objects.filter(id=campaign_id).exists():
+                raise PermissionDenied("You do not have permission to add documents to this campaign")
         
         try:
             # Use upload_document instead of process_document
@@ -77,37 +188,42 @@ class DocumentViewSet(viewsets.ModelViewSet):
             if hasattr(serializer, 'instance'):
                 serializer.instance = document
             return document
-        except Exception as e:
-            # Log the error
-            logger.error(f"Error uploading document: {str(e)}")
+        except Exception:
+            # Log the error with its traceback
+            logger.exception("Error uploading document %s", title)
             # Let the exception propagate to give proper error response
             raise
     
     def retrieve(self, request, *args, **kwargs):
         """Return detailed information about a document"""
+        # get_queryset already joins the campaign, so this needs no extra queries
         document = self.get_object()
-        
-        try:
-            document_details = DocumentService.get_document_details(document.id)
-            serializer = DocumentDetailSerializer(document_details)
-            return Response(serializer.data)
-        except DocumentNotFoundException:
-            return Response(
-                {"error": "Document not found or not processed yet"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        serializer = DocumentDetailSerializer(document)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
         """Download the original document file"""
         document = self.get_object()
+        filename = os.path.basename(document.file.name)
+        
+        # Let the reverse proxy stream the file with sendfile when configured
+        accel_prefix = settings.DOCUMENTS_X_ACCEL_REDIRECT_PREFIX
+        if accel_prefix:
+            response = HttpResponse()
+            response['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{document.file.name}"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            # Empty Content-Type lets nginx set it from the file extension
+            response['Content-Type'] = ''
+            return response
+        
         file_path = document.file.path
         
         if os.path.exists(file_path):
             response = FileResponse(
                 open(file_path, 'rb'),
                 as_attachment=True,
-                filename=os.path.basename(file_path)
+                filename=filename
             )
             return response
         else:
@@ -131,16 +247,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         try:
             # Perform search using ChromaDB
-            results = DocumentService.search_documents(
-                query_text=query,
-                campaign_id=campaign_id,
-                limit=limit
-            )
+            results = cached_search(request.user, query, campaign_id, limit)
             
             return Response({'results': results})
-        except Exception as e:
+        except Exception:
+            logger.exception("Error searching documents")
             return Response(
-                {"error": str(e)},
+                {"error": "Search failed."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
@@ -156,27 +269,30 @@ class DocumentViewSet(viewsets.ModelViewSet):
             )
             
         # Verify the user has access to this campaign
-        campaign = get_object_or_404(Campaign, id=campaign_id)
-        if campaign.user != request.user:
+        if get_campaign_owner_id(campaign_id) != request.user.id:
             return Response(
                 {"error": "You do not have permission to access this campaign"},
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        documents = Document.objects.filter(campaign=campaign)
-        serializer = DocumentSerializer(documents, many=True)
-        return Response(serializer.data)
+        # Plain dict rows skip model instantiation
+        documents = Document.objects.filter(campaign_id=campaign_id).values(*DocumentSummarySerializer.VALUES)
+        return stream_serialized_list(documents, DocumentSummarySerializer)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([UserRateThrottle, UploadRateThrottle])
 def upload_document(request):
     """
-    Upload, process, and index a document.
+    Upload a document and queue it for processing and indexing.
+    
+    This endpoint stores the document file and returns immediately with
+    status 202. In the background the document is then:
+    1. Processed and its text chunked
+    2. Added to the ChromaDB vector store
     
-    This endpoint handles the complete process of:
-    1. Uploading the document file
-    2. Processing and chunking the document text
-    3. Adding the chunks to the ChromaDB vector store
+    Poll the document's `status` (PENDING -> PROCESSING -> COMPLETE/FAILED)
+    to see when it is searchable.
     
     The document will be associated with the current user and optionally a campaign.
     
@@ -185,6 +301,9 @@ def upload_document(request):
     - title: Document title
     - description: (optional) Document description
     - campaign_id: (optional) Campaign ID to associate with
+    
+    Clients may send an `Idempotency-Key` header; retries with the same key
+    within an hour return the original response instead of uploading again.
     """
     # Get required fields
     file = request.FILES.get('file')
@@ -203,15 +322,25 @@ def upload_document(request):
     # Get campaign if ID provided
     campaign = None
     if campaign_id:
-        from recorder.models import Campaign
         try:
             campaign = Campaign.objects.get(id=campaign_id, user=request.user)
         except Campaign.DoesNotExist:
             return Response({'error': f'Campaign with ID {campaign_id} not found.'}, 
                           status=status.HTTP_404_NOT_FOUND)
     
+    # Replay the response of an earlier request with the same Idempotency-Key
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        idempotency_key = f'idem:{request.user.id}:{idempotency_key}'
+        if not cache.add(idempotency_key, IDEMPOTENCY_PENDING, IDEMPOTENCY_TTL):
+            previous = cache.get(idempotency_key)
+            if previous is None or previous == IDEMPOTENCY_PENDING:
+                return Response({'error': 'A request with this Idempotency-Key is already in progress.'},
+                              status=status.HTTP_409_CONFLICT)
+            return Response(previous['data'], status=previous['status'])
+    
     try:
-        # Upload and process document
+        # Store the document; processing continues in the background
         document = DocumentService.upload_document(
             file=file,
             title=title,
@@ -222,11 +351,16 @@ def upload_document(request):
         
         # Return the document details
         serializer = DocumentSerializer(document)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if idempotency_key:
+            cache.set(idempotency_key, {'data': serializer.data, 'status': status.HTTP_202_ACCEPTED}, IDEMPOTENCY_TTL)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     
-    except Exception as e:
-        logger.error(f"Error processing document: {str(e)}")
-        return Response({'error': f'Failed to process document: {str(e)}'}, 
+    except Exception:
+        logger.exception("Error uploading document %s", title)
+        # Let the client retry with the same key
+        if idempotency_key:
+            cache.delete(idempotency_key)
+        return Response({'error': 'Failed to process document.'}, 
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
@@ -244,9 +378,9 @@ def list_documents(request):
     if campaign_id:
         documents = documents.filter(campaign_id=campaign_id)
     
-    # Serialize and return
-    serializer = DocumentSerializer(documents, many=True)
-    return Response(serializer.data)
+    # Serialize plain dict rows (no model instances) and stream
+    documents = documents.values(*DocumentSummarySerializer.VALUES)
+    return stream_serialized_list(documents, DocumentSummarySerializer)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -270,9 +404,9 @@ def get_document(request, document_id):
         return Response({'error': f'Document with ID {document_id} not found.'}, 
                        status=status.HTTP_404_NOT_FOUND)
     
-    except Exception as e:
-        logger.error(f"Error getting document details: {str(e)}")
-        return Response({'error': f'Failed to retrieve document: {str(e)}'}, 
+    except Exception:
+        logger.exception("Error getting document details for %s", document_id)
+        return Response({'error': 'Failed to retrieve document.'}, 
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['DELETE'])
@@ -297,13 +431,14 @@ def delete_document(request, document_id):
         return Response({'error': f'Document with ID {document_id} not found.'}, 
                        status=status.HTTP_404_NOT_FOUND)
     
-    except Exception as e:
-        logger.error(f"Error deleting document: {str(e)}")
-        return Response({'error': f'Failed to delete document: {str(e)}'}, 
+    except Exception:
+        logger.exception("Error deleting document %s", document_id)
+        return Response({'error': 'Failed to delete document.'}, 
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([UserRateThrottle])
 def search_documents(request):
     """
     Search for documents based on a query.
@@ -324,12 +459,8 @@ def search_documents(request):
         return Response({'error': 'Search query is required.'}, 
                        status=status.HTTP_400_BAD_REQUEST)
     
-    # Perform search
-    results = DocumentService.search_documents(
-        query_text=query,
-        campaign_id=campaign_id,
-        limit=limit
-    )
+    # Perform search (repeated queries are served from the cache)
+    results = cached_search(request.user, query, campaign_id, limit)
     
     return Response({'results': results})
 
@@ -1,63 +1,43 @@
-from django.apps import AppConfig
 import logging
+from threading import Thread
+from django.apps import AppConfig
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 
+def warm_embedding_model():
+    """Load the local embedding model and run one encode, so the first real use doesn't pay for it"""
+    from .utils import get_embedding_model
+
+    try:
+        get_embedding_model().encode(["warmup"], show_progress_bar=False)
+    except Exception as e:
+        logger.warning("Could not warm up the embedding model: %s", e)
+
+
+def init_vector_store():
+    """Open the ChromaDB client and collection, so the first requests don't race to do it"""
+    from .vector_store import ChromaVectorStore
+
+    try:
+        ChromaVectorStore()
+    except Exception as e:
+        logger.warning("Could not initialize the vector store: %s", e)
+
+
 class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
-    
+
     def ready(self):
-        """
-        Method called when the Django application is ready.
-        Lists the contents of the vector store.
-        """
-        # Import services here to avoid circular imports
-        try:
-            from .services import DocumentService
-            import os
-            
-            # Check if project ID is set
-            project_id = os.environ.get('OPENAI_PROJECT_ID', 'proj_G4NvFcOxfJHoDAHb8CtH3iEM')
-            logger.info(f"Using OpenAI Project ID: {project_id}")
-            
-            # Check if vector store ID is set before attempting to list contents
-            vector_store_id = os.environ.get('VECTOR_STORE_ID')
-            if not vector_store_id:
-                logger.warning("VECTOR_STORE_ID environment variable not set. Skipping vector store listing.")
-                return
-            
-            logger.info(f"Using Vector Store ID: {vector_store_id}")
-            
-            # List vector store contents
-            logger.info("Listing OpenAI Vector Store contents...")
-            try:
-                vector_store_info = DocumentService.list_vector_store_contents()
-                if "error" in vector_store_info:
-                    logger.error(f"Failed to list vector store contents: {vector_store_info['error']}")
-                else:
-                    logger.info(f"Vector Store: {vector_store_info['name']} (ID: {vector_store_info['id']})")
-                    logger.info(f"File count: {vector_store_info['file_count']}")
-                    
-                    # List each file in the vector store
-                    if vector_store_info['file_count'] > 0:
-                        logger.info("Files in Vector Store:")
-                        for idx, file in enumerate(vector_store_info['files'], 1):
-                            # Handle the case where file_id might not be present
-                            file_id = file.get('file_id', file.get('id', 'unknown'))
-                            status = file.get('status', 'unknown')
-                            filename = file.get('filename', 'Unknown name')
-                            
-                            # Print file information in a clear format
-                            logger.info(f"  {idx}. File: {filename}")
-                            logger.info(f"     ID: {file_id}")
-                            logger.info(f"     Status: {status}")
-                    else:
-                        logger.info("No files found in the Vector Store.")
-            except Exception as e:
-                logger.error(f"Error in ready method when listing vector store: {str(e)}")
-        except ImportError as e:
-            logger.error(f"Import error in ready method: {str(e)}")
-        except Exception as e:
-            logger.error(f"Unexpected error in ready method: {str(e)}")
+        # Register signal handlers
+        from . import signals  # noqa: F401
+
+        # Warm the model in the background so startup isn't blocked on it
+        if getattr(settings, 'DOCUMENTS_WARM_EMBEDDING_MODEL', False):
+            Thread(target=warm_embedding_model, daemon=True).start()
+
+        # Requests that arrive before this finishes wait on the store's lock
+        if getattr(settings, 'DOCUMENTS_INIT_VECTOR_STORE', False):
+            Thread(target=init_vector_store, daemon=True).start()
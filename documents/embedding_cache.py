@@ -0,0 +1,164 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+from django.core.cache import cache
+from .models import EmbeddingCache
+from .openai_client import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+# OpenAI embedding model used for the ChromaDB collection
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Limits for one embeddings request: the API accepts up to 2048 inputs, and we
+# keep the total text well under its per-request token limit (~4 chars per token)
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_BATCH_MAX_CHARS = 600000
+
+# Embeddings requests sent concurrently when texts need more than one
+EMBEDDING_MAX_CONCURRENCY = 4
+
+# How long query embeddings stay cached (in seconds)
+QUERY_EMBEDDING_TTL = 86400
+
+# Query embeddings also kept in each process, in front of the shared cache
+QUERY_EMBEDDING_LOCAL_CACHE_SIZE = 4096
+
+def _batches(texts):
+    """Split texts into as few embeddings requests as the API limits allow"""
+    batch = []
+    batch_chars = 0
+    for text in texts:
+        if batch and (len(batch) >= EMBEDDING_BATCH_SIZE or batch_chars + len(text) > EMBEDDING_BATCH_MAX_CHARS):
+            yield batch
+            batch = []
+            batch_chars = 0
+        batch.append(text)
+        batch_chars += len(text)
+    if batch:
+        yield batch
+
+def cached_embeddings(texts, model_name, embed):
+    """
+    Get embeddings through the persistent content-addressed cache
+
+    Vectors are stored in EmbeddingCache keyed by SHA-256 of the model name
+    and text. Cached vectors are read in bulk, and embed() is called once
+    with just the distinct texts that aren't cached yet; its results are
+    stored for next time. Identical texts (repeated boilerplate, stat
+    blocks, a reprocessed document) are never embedded twice.
+
+    Args:
+        texts (list): List of text strings (non-empty)
+        model_name (str): Name of the embedding model, part of the cache key
+        embed (callable): Takes a list of texts, returns a float32 array of their embeddings
+
+    Returns:
+        numpy.ndarray: float32 array of shape (len(texts), dimensions)
+    """
+    keys = [
+        hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+        for text in texts
+    ]
+    # Look up distinct keys in slices that stay under SQLite's parameter limit
+    distinct_keys = list(dict.fromkeys(keys))
+    cached = {}
+    for start in range(0, len(distinct_keys), 500):
+        rows = EmbeddingCache.objects.filter(hash__in=distinct_keys[start:start + 500]).values_list('hash', 'vector')
+        cached.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+
+    # Embed each distinct uncached text once
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in misses:
+            misses[key] = text
+
+    if misses:
+        encoded = np.asarray(embed(list(misses.values())), dtype=np.float32)
+
+        new_entries = []
+        for key, vector in zip(misses, encoded):
+            cached[key] = vector
+            new_entries.append(EmbeddingCache(hash=key, model=model_name, vector=vector.tobytes()))
+        EmbeddingCache.objects.bulk_create(new_entries, batch_size=500, ignore_conflicts=True)
+
+    logger.info(f"Embedded {len(texts)} texts with {model_name}, {len(texts) - len(misses)} from cache")
+    return np.stack([cached[key] for key in keys])
+
+def _request_embeddings(texts):
+    """
+    Request OpenAI embeddings for a list of texts, batching the requests
+
+    Args:
+        texts (list): List of text strings
+
+    Returns:
+        numpy.ndarray: float32 array of shape (len(texts), dimensions)
+    """
+    client = get_openai_client()
+
+    def embed_batch(batch):
+        response = client.embeddings.create(model=OPENAI_EMBEDDING_MODEL, input=batch)
+        # Keep the order of the input texts
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    batches = list(_batches(texts))
+    if len(batches) == 1:
+        results = [embed_batch(batches[0])]
+    else:
+        # Overlap the round trips of several requests (the shared client is thread-safe);
+        # map() returns the batches in order
+        with ThreadPoolExecutor(max_workers=min(EMBEDDING_MAX_CONCURRENCY, len(batches))) as executor:
+            results = list(executor.map(embed_batch, batches))
+    vectors = [vector for batch_vectors in results for vector in batch_vectors]
+
+    logger.info(f"Created {len(vectors)} embeddings in {len(batches)} requests")
+    return np.array(vectors, dtype=np.float32)
+
+def embed_texts(texts):
+    """
+    Create OpenAI embeddings for a list of texts
+
+    Goes through the persistent cache (see cached_embeddings), so only
+    distinct texts that were never embedded before are sent to the API.
+
+    Args:
+        texts (list): List of text strings
+
+    Returns:
+        numpy.ndarray: float32 array of shape (len(texts), dimensions)
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    return cached_embeddings(texts, OPENAI_EMBEDDING_MODEL, _request_embeddings)
+
+@lru_cache(maxsize=QUERY_EMBEDDING_LOCAL_CACHE_SIZE)
+def _query_embedding_bytes(model, text):
+    """Query embedding as raw float32 bytes, from the shared cache or the API"""
+    key = 'emb:' + hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    vector = _request_embeddings([text])[0].tobytes()
+    cache.set(key, vector, timeout=QUERY_EMBEDDING_TTL)
+    return vector
+
+def embed_query(text):
+    """
+    Create the embedding for a search query, caching it by SHA-256 of the text
+
+    Repeated queries are answered from a per-process LRU first, then from
+    the shared Django cache (Redis when configured), and only then sent to
+    the API.
+
+    Args:
+        text (str): Query text
+
+    Returns:
+        numpy.ndarray: float32 query embedding (read-only)
+    """
+    return np.frombuffer(_query_embedding_bytes(OPENAI_EMBEDDING_MODEL, text), dtype=np.float32)
@@ -0,0 +1,75 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# External-content FTS5 index over DocumentChunk.text (created by migration
+# 0006), kept in sync by triggers on documents_documentchunk
+FTS_TABLE = 'documents_documentchunk_fts'
+CHUNK_TABLE = 'documents_documentchunk'
+
+FTS_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {CHUNK_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, id, text) VALUES (new.rowid, new.id, new.text);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {CHUNK_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, id, text) VALUES ('delete', old.rowid, old.id, old.text);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text ON {CHUNK_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, id, text) VALUES ('delete', old.rowid, old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, id, text) VALUES (new.rowid, new.id, new.text);
+        END
+    """,
+}
+
+CREATE_TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        id UNINDEXED, text,
+        content='{CHUNK_TABLE}', content_rowid='rowid'
+    )
+"""
+
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def ensure_fts_index(connection, rebuild=False):
+    """
+    Recreate a missing FTS table or triggers and rebuild the index
+
+    Django's SQLite schema editor rebuilds documents_documentchunk (copy,
+    drop, rename) for most field changes, which silently drops the
+    triggers, and the index then goes stale. This puts back whatever is
+    missing and, if anything was, rebuilds the index from the chunk table.
+    Does nothing on other databases or before the chunk table exists.
+
+    Args:
+        connection: Database connection to check
+        rebuild (bool): Rebuild the index even if nothing was missing
+
+    Returns:
+        bool: Whether the index was rebuilt
+    """
+    if connection.vendor != 'sqlite':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        if CHUNK_TABLE not in existing:
+            return False
+
+        missing = ({FTS_TABLE} | set(FTS_TRIGGERS)) - existing
+        if not missing and not rebuild:
+            return False
+        if missing:
+            logger.warning("Recreating full-text index objects: %s", ', '.join(sorted(missing)))
+
+        cursor.execute(CREATE_TABLE_SQL)
+        for sql in FTS_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(REBUILD_SQL)
+    return True
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from documents.fts import ensure_fts_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the document chunk full-text index and its triggers, and rebuild it (SQLite only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database to rebuild the index in")
+
+    def handle(self, *args, **options):
+        if ensure_fts_index(connections[options['database']], rebuild=True):
+            self.stdout.write("Full-text index rebuilt.")
+        else:
+            self.stdout.write("Nothing to rebuild (not SQLite, or the chunk table doesn't exist).")
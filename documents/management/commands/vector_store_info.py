@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.models import Document
+from documents.vector_store import ChromaVectorStore
+
+
+class Command(BaseCommand):
+    help = "List the contents of the ChromaDB vector store"
+
+    def handle(self, *args, **options):
+        collection_info = ChromaVectorStore.get_collection_info()
+        if "error" in collection_info:
+            raise CommandError(f"Failed to read vector store: {collection_info['error']}")
+
+        self.stdout.write(f"Collection: {collection_info['name']}")
+        self.stdout.write(f"Chunk count: {collection_info['count']}")
+
+        documents = Document.objects.filter(status=Document.Status.COMPLETE).only('id', 'title')
+        if not documents:
+            self.stdout.write("No indexed documents found.")
+            return
+
+        self.stdout.write("Indexed documents:")
+        for idx, document in enumerate(documents, 1):
+            self.stdout.write(f"  {idx}. {document.title}")
+            self.stdout.write(f"     ID: {document.id}")
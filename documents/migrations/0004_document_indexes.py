@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-15 10:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_document_openai_file_id'),
+        ('recorder', '0007_npc'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'status', '-created_at'], name='doc_uploader_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['campaign', 'status', '-created_at'], name='doc_campaign_status_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+import json
+from array import array
+
+from django.db import migrations, models
+
+
+def json_to_float32(apps, schema_editor):
+    """Convert JSON embedding arrays into raw float32 bytes"""
+    DocumentChunk = apps.get_model('documents', 'DocumentChunk')
+    batch = []
+    chunks = DocumentChunk.objects.exclude(embedding__isnull=True).only('id', 'embedding')
+    for chunk in chunks.iterator(chunk_size=500):
+        values = chunk.embedding
+        if isinstance(values, str):
+            values = json.loads(values)
+        chunk.embedding_f32 = array('f', values).tobytes()
+        batch.append(chunk)
+        if len(batch) >= 500:
+            DocumentChunk.objects.bulk_update(batch, ['embedding_f32'], batch_size=500)
+            batch = []
+    if batch:
+        DocumentChunk.objects.bulk_update(batch, ['embedding_f32'], batch_size=500)
+
+
+def float32_to_json(apps, schema_editor):
+    """Convert raw float32 bytes back into JSON embedding arrays"""
+    DocumentChunk = apps.get_model('documents', 'DocumentChunk')
+    batch = []
+    chunks = DocumentChunk.objects.exclude(embedding_f32__isnull=True).only('id', 'embedding_f32')
+    for chunk in chunks.iterator(chunk_size=500):
+        chunk.embedding = array('f', bytes(chunk.embedding_f32)).tolist()
+        batch.append(chunk)
+        if len(batch) >= 500:
+            DocumentChunk.objects.bulk_update(batch, ['embedding'], batch_size=500)
+            batch = []
+    if batch:
+        DocumentChunk.objects.bulk_update(batch, ['embedding'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_document_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='embedding_f32',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(json_to_float32, float32_to_json),
+        migrations.RemoveField(
+            model_name='documentchunk',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='documentchunk',
+            old_name='embedding_f32',
+            new_name='embedding',
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# External-content FTS5 index over DocumentChunk.text, kept in sync by triggers
+FTS_TABLE = 'documents_documentchunk_fts'
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        id UNINDEXED, text,
+        content='documents_documentchunk', content_rowid='rowid'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON documents_documentchunk BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, id, text) VALUES (new.rowid, new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON documents_documentchunk BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, id, text) VALUES ('delete', old.rowid, old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF text ON documents_documentchunk BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, id, text) VALUES ('delete', old.rowid, old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, id, text) VALUES (new.rowid, new.id, new.text);
+    END
+    """,
+    # Index the chunks that already exist
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    """Create the FTS5 table and triggers (SQLite only; other databases skip the prefilter)"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts_index(apps, schema_editor):
+    """Drop the FTS5 table and triggers"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_documentchunk_embedding_float32'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
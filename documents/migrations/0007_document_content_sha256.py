@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-15 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_documentchunk_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file contents', max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def _relation_lookups(model, serializer, prefix=''):
+    """
+    Work out the select_related/prefetch_related lookups a serializer needs
+
+    Walks the serializer's readable fields: dotted sources (e.g.
+    'campaign.name') and nested serializers on to-one relations become
+    select_related paths, to-many relations become prefetch_related paths.
+    Plain primary key fields need no join.
+
+    Args:
+        model: Model class the serializer reads from
+        serializer: Serializer instance
+        prefix (str): Lookup prefix for nested serializers
+
+    Returns:
+        tuple: (set of select_related paths, set of prefetch_related paths)
+    """
+    select, prefetch = set(), set()
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        parts = field.source.split('.')
+        is_nested = isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField))
+        needs_target = is_nested or (
+            isinstance(field, serializers.RelatedField)
+            and not isinstance(field, serializers.PrimaryKeyRelatedField)
+        )
+        # The last part is the attribute being read; it only needs a join if the
+        # field renders something from the related object itself
+        relation_parts = parts if needs_target else parts[:-1]
+
+        current_model = model
+        path = []
+        for part in relation_parts:
+            try:
+                model_field = current_model._meta.get_field(part)
+            except FieldDoesNotExist:
+                # Properties, annotations and other non-field attributes
+                break
+            if not model_field.is_relation:
+                break
+            path.append(part)
+            lookup = prefix + '__'.join(path)
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.add(lookup)
+                break
+            select.add(lookup)
+            current_model = model_field.related_model
+
+        # Recurse into nested serializers on a to-one relation
+        if isinstance(field, serializers.Serializer) and path and (prefix + '__'.join(path)) in select:
+            nested_select, nested_prefetch = _relation_lookups(
+                current_model, field, prefix + '__'.join(path) + '__'
+            )
+            select |= nested_select
+            prefetch |= nested_prefetch
+
+    return select, prefetch
+
+
+class AutoPrefetchViewSetMixin:
+    """
+    Derive select_related/prefetch_related from the serializer used by the
+    current action, so related data the response reads is always loaded in
+    bulk (and nothing it doesn't read is joined).
+
+    Applied in filter_queryset so it covers both list() and get_object().
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, serializers.ModelSerializer):
+            return queryset
+
+        select, prefetch = _relation_lookups(queryset.model, serializer_class())
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        return queryset
@@ -1,7 +1,9 @@
 import uuid
 import os
+import numpy as np
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from recorder.models import Campaign
 
@@ -30,6 +32,7 @@ class Document(models.Model):
     openai_file_id = models.CharField(max_length=255, blank=True, null=True, unique=True, help_text="OpenAI File ID")
     file_type = models.CharField(max_length=10)  # pdf, docx, txt, etc.
     file_size = models.PositiveIntegerField(default=0)  # Size in bytes
+    content_sha256 = models.CharField(max_length=64, null=True, blank=True, db_index=True, help_text="SHA-256 of the file contents")
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='documents')
     campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='documents', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -45,30 +48,60 @@ class Document(models.Model):
         return self.title
     
     def get_file_extension(self):
-        """Return the file extension"""
-        return self.file.name.split('.')[-1]
+        """Return the lowercased file extension"""
+        return os.path.splitext(self.file.name)[1][1:].lower()
+    
+    def update_status(self, status):
+        """
+        Set the processing status with a single-column UPDATE
+        
+        Skips save() entirely: no file metadata checks, no signals, so
+        cached searches are invalidated here directly.
+        
+        Args:
+            status (str): New Document.Status value
+        """
+        from .signals import bump_search_cache_version
+        
+        self.status = status
+        self.updated_at = timezone.now()
+        Document.objects.filter(pk=self.pk).update(status=status, updated_at=self.updated_at)
+        bump_search_cache_version([self.campaign_id])
     
     def save(self, *args, **kwargs):
-        # Set file type based on file extension if not already set
-        if not self.file_type and self.file:
-            self.file_type = self.get_file_extension()
-            
-        # Set file size if not already set
-        if self.file and not self.file_size and hasattr(self.file, 'size'):
-            self.file_size = self.file.size
+        # Fill in file metadata on the first save only, so later saves
+        # (e.g. status updates) never touch storage
+        if self._state.adding and self.file:
+            if not self.file_type:
+                self.file_type = self.get_file_extension()
+            if not self.file_size and hasattr(self.file, 'size'):
+                self.file_size = self.file.size
             
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Cover the per-user and per-campaign list/search filters
+            models.Index(fields=['uploaded_by', 'status', '-created_at'], name='doc_uploader_status_idx'),
+            models.Index(fields=['campaign', 'status', '-created_at'], name='doc_campaign_status_idx'),
+        ]
 
 class DocumentChunk(models.Model):
-    """Model for storing document chunks with vector embeddings"""
+    """
+    Model for storing document chunks with vector embeddings
+    
+    On SQLite, text is full-text indexed by an FTS5 table kept in sync by
+    raw SQL triggers on this table (see fts.py). Schema changes that make
+    Django rebuild the table drop those triggers; the post_migrate handler
+    in signals.py recreates them and rebuilds the index, and
+    `manage.py rebuild_fts_index` does the same by hand.
+    """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='chunks')
     chunk_index = models.PositiveIntegerField()  # Position of chunk in the document
     text = models.TextField()  # The actual text chunk
-    embedding = models.JSONField(null=True, blank=True)  # Store embedding as JSON array
+    embedding = models.BinaryField(null=True, blank=True)  # Raw float32 vector bytes (see get_vector/set_vector)
     page_number = models.PositiveIntegerField(null=True, blank=True)  # Optional page number if available
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -76,6 +109,26 @@ class DocumentChunk(models.Model):
     def __str__(self):
         return f"{self.document.title} - Chunk {self.chunk_index}"
     
+    def get_vector(self):
+        """Return the embedding as a float32 numpy array (without copying the bytes)"""
+        if self.embedding is None:
+            return None
+        return np.frombuffer(self.embedding, dtype=np.float32)
+    
+    def set_vector(self, vector):
+        """Store a vector as raw float32 bytes"""
+        self.embedding = np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+    
     class Meta:
         ordering = ['document', 'chunk_index']
         unique_together = ['document', 'chunk_index']
+
+class EmbeddingCache(models.Model):
+    """Embedding of a text, keyed by SHA-256 of the model name and text"""
+    hash = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=255)
+    vector = models.BinaryField()  # Raw float32 vector bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.model} - {self.hash}"
@@ -0,0 +1,39 @@
+import logging
+import httpx
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+# Connection pool shared by all OpenAI requests made from this process
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+REQUEST_TIMEOUT = 30.0
+
+_openai_client = None
+
+def _create_http_client():
+    """
+    Create a pooled keep-alive HTTP client, using HTTP/2 when available
+    """
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+    )
+    try:
+        return httpx.Client(http2=True, limits=limits, timeout=REQUEST_TIMEOUT)
+    except ImportError:
+        # HTTP/2 support needs the 'h2' package (pip install "httpx[http2]")
+        logger.warning("h2 not installed, OpenAI requests will use HTTP/1.1")
+        return httpx.Client(limits=limits, timeout=REQUEST_TIMEOUT)
+
+def get_openai_client():
+    """
+    Get or initialize the shared OpenAI client
+    
+    Reusing one client keeps TLS connections alive across requests instead
+    of paying a new handshake per call.
+    """
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI(http_client=_create_http_client())
+    return _openai_client
@@ -0,0 +1,71 @@
+"""
+PDF page extraction that can run in worker processes
+
+Kept free of Django imports so spawned workers can import it without
+setting up the app registry.
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import PyPDF2
+
+# Smaller PDFs are extracted in-process; starting workers costs more than it saves
+PARALLEL_MIN_PAGES = 32
+
+# Pages per worker task; each task opens the PDF once for its whole range
+PAGES_PER_TASK = 16
+
+def extract_page_range(file_path, start, end):
+    """
+    Extract the text of pages [start, end) of a PDF
+
+    Args:
+        file_path (str): Path to the PDF
+        start (int): First page index (0-based)
+        end (int): Page index to stop before
+
+    Returns:
+        list: Text of each page in the range
+    """
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def _extract_task(args):
+    return extract_page_range(*args)
+
+def iter_page_texts(file_path, max_workers=None):
+    """
+    Yield the text of every page of a PDF, in order
+
+    Large PDFs are split into page ranges that are extracted in parallel
+    by a process pool (page extraction is CPU-bound pure Python, so
+    threads wouldn't help). Workers are spawned rather than forked, since
+    this runs from a background thread of the web process.
+
+    Args:
+        file_path (str): Path to the PDF
+        max_workers (int): Optional worker limit (default: CPU count)
+
+    Yields:
+        str: Page text
+    """
+    with open(file_path, 'rb') as file:
+        page_count = len(PyPDF2.PdfReader(file).pages)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if page_count < PARALLEL_MIN_PAGES or max_workers < 2:
+        yield from extract_page_range(file_path, 0, page_count)
+        return
+
+    tasks = [
+        (file_path, start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(tasks)),
+        mp_context=multiprocessing.get_context('spawn'),
+    ) as executor:
+        # map() returns results in task order, as soon as each is ready
+        for texts in executor.map(_extract_task, tasks):
+            yield from texts
@@ -0,0 +1,36 @@
+import logging
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    logger.warning("orjson not installed, API responses will use the standard json encoder. Run: pip install orjson")
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it's installed
+
+    orjson handles UUIDs, numpy values and dict/list subclasses natively in C.
+    Datetimes and anything else orjson doesn't know are passed to DRF's
+    encoder, so the output is the same as JSONRenderer's. Falls back to
+    JSONRenderer entirely without orjson or when indented output is requested.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
@@ -1,7 +1,26 @@
+import copy
 from rest_framework import serializers
 from .models import Document, DocumentChunk
 
-class ChunkSerializer(serializers.ModelSerializer):
+class CachedFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that introspects the model fields once per class
+    
+    Later instances get a deep copy of the cached fields (DRF fields copy
+    cheaply from their constructor arguments), so each instance still binds
+    its own field objects.
+    """
+    
+    def get_fields(self):
+        cls = type(self)
+        # Look in the class's own __dict__ so subclasses don't share a cache
+        cached_fields = cls.__dict__.get('_cached_fields')
+        if cached_fields is None:
+            cached_fields = super().get_fields()
+            cls._cached_fields = cached_fields
+        return copy.deepcopy(cached_fields)
+
+class ChunkSerializer(CachedFieldsModelSerializer):
     """Serializer for document chunks"""
     
     class Meta:
@@ -9,40 +28,32 @@ class ChunkSerializer(serializers.ModelSerializer):
         fields = ['id', 'chunk_index', 'text', 'page_number']
         read_only_fields = ['id']
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(CachedFieldsModelSerializer):
     """Basic serializer for documents, used in the upload response."""
-    campaign_name = serializers.SerializerMethodField()
+    campaign_name = serializers.CharField(source='campaign.name', read_only=True, allow_null=True)
     
     class Meta:
         model = Document
         # Add openai_file_id, remove file (as it's not needed in response)
         fields = ['id', 'title', 'openai_file_id', 'file_type', 'campaign', 'campaign_name', 'status', 'created_at', 'updated_at']
         read_only_fields = ['id', 'openai_file_id', 'file_type', 'status', 'created_at', 'updated_at', 'campaign_name']
-    
-    def get_campaign_name(self, obj):
-        return obj.campaign.name if obj.campaign else None
 
-class DocumentListSerializer(serializers.ModelSerializer):
-    """Serializer for listing documents. Keep local file info for now."""
-    campaign_name = serializers.SerializerMethodField()
-    # chunk_count = serializers.SerializerMethodField() # Remove chunk count as chunks are not local
+class DocumentListSerializer(CachedFieldsModelSerializer):
+    """Serializer for listing documents. Expects a queryset annotated with chunk_count."""
+    campaign_name = serializers.CharField(source='campaign.name', read_only=True, allow_null=True)
+    # Annotated on the queryset with Count('chunks') instead of one COUNT per row
+    chunk_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Document
         # Add openai_file_id
-        fields = ['id', 'title', 'openai_file_id', 'file_type', 'file_size', 'campaign', 'campaign_name', 'status', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'openai_file_id', 'file_type', 'file_size', 'status', 'created_at', 'updated_at', 'campaign_name']
-    
-    def get_campaign_name(self, obj):
-        return obj.campaign.name if obj.campaign else None
-    
-    # def get_chunk_count(self, obj):
-    #     return obj.chunks.count() # Chunks no longer local
+        fields = ['id', 'title', 'openai_file_id', 'file_type', 'file_size', 'campaign', 'campaign_name', 'chunk_count', 'status', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'openai_file_id', 'file_type', 'file_size', 'status', 'created_at', 'updated_at', 'campaign_name', 'chunk_count']
 
-class DocumentDetailSerializer(serializers.ModelSerializer):
+class DocumentDetailSerializer(CachedFieldsModelSerializer):
     """Detailed serializer for documents including chunks. Remove chunks."""
     # chunks = ChunkSerializer(many=True, read_only=True) # Remove chunks
-    campaign_name = serializers.SerializerMethodField()
+    campaign_name = serializers.CharField(source='campaign.name', read_only=True, allow_null=True)
     
     class Meta:
         model = Document
@@ -56,12 +67,35 @@ class DocumentDetailSerializer(serializers.ModelSerializer):
             'id', 'openai_file_id', 'file_type', 'file_size', 'status', 
             'created_at', 'updated_at', 'campaign_name'
         ]
+
+class DocumentSummarySerializer(serializers.Serializer):
+    """
+    Serializer for document lists built from .values() rows instead of model
+    instances. Produces the same fields as DocumentSerializer.
+    """
+    # Columns to pass to Document.objects.values()
+    VALUES = (
+        'id', 'title', 'openai_file_id', 'file_type', 'campaign_id', 'campaign__name',
+        'status', 'created_at', 'updated_at',
+    )
     
-    def get_campaign_name(self, obj):
-        return obj.campaign.name if obj.campaign else None
+    id = serializers.UUIDField()
+    title = serializers.CharField()
+    openai_file_id = serializers.CharField(allow_null=True)
+    file_type = serializers.CharField()
+    campaign = serializers.UUIDField(source='campaign_id', allow_null=True)
+    campaign_name = serializers.CharField(source='campaign__name', allow_null=True)
+    status = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
 
 class DocumentSearchResultSerializer(serializers.Serializer):
-    """Serializer for document search results"""
+    """
+    Serializer for document search results
+    
+    Documents the result shape of utils.search_documents; the search endpoint
+    returns those dicts directly rather than running them through this.
+    """
     document_id = serializers.UUIDField()
     document_title = serializers.CharField()
     campaign_id = serializers.UUIDField(allow_null=True)
@@ -1,22 +1,43 @@
 import os
 import json
+import hashlib
 import logging
 import time
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
 from openai import OpenAI, APIError, RateLimitError
 from .models import Document, DocumentChunk
-from .utils import extract_text, chunk_text, create_embeddings
+from .utils import extract_chunks, create_embeddings
 from .vector_store import ChromaVectorStore
+from .embedding_cache import embed_texts
+from .tasks import schedule_document_processing, schedule_document_cleanup
+from .signals import bump_search_cache_version
 
 # Force reload - code has been updated
 logger = logging.getLogger(__name__)
 
+# Documents loaded per batch while reindexing
+REINDEX_CHUNK_SIZE = 100
+
+# Pending chunk texts that trigger an embed + ChromaDB add while reindexing.
+# Kept well below EMBEDDING_BATCH_SIZE so a flush holds a bounded number of
+# documents and chunk texts in memory.
+REINDEX_FLUSH_SIZE = 200
+
 class DocumentService:
     @staticmethod
     def upload_document(file, title, description, user, campaign=None):
         """
-        Create the Document record, process the file, and add to ChromaDB vector store.
+        Create the Document record and schedule it for processing.
+        
+        Text extraction, chunking and indexing run in the background (see
+        tasks.py); the document stays PENDING until processing starts.
+        
+        If the same file (by SHA-256) was already uploaded to the campaign
+        (or, without a campaign, by the same user) and didn't fail, the
+        existing Document is returned and nothing is processed again.
         
         Args:
             file: File object from request
@@ -26,84 +47,165 @@ class DocumentService:
             campaign: Optional Campaign to associate with the document
             
         Returns:
-            Document: The created Document instance
+            Document: The created (or existing duplicate) Document instance
         """
-        document = None
+        # Hash the upload in chunks so large files aren't read into memory at once
+        sha256 = hashlib.sha256()
+        for data in file.chunks():
+            sha256.update(data)
+        content_sha256 = sha256.hexdigest()
+        file.seek(0)
         
-        try:
-            # Create the document record
-            document = Document.objects.create(
-                title=title,
-                description=description,
-                file=file,
-                uploaded_by=user,
-                campaign=campaign,
-                status=Document.Status.PENDING
-            )
-            logger.info(f"Created Document record {document.id} for {title}")
+        duplicates = Document.objects.filter(content_sha256=content_sha256, campaign=campaign).exclude(
+            status=Document.Status.FAILED
+        )
+        if campaign is None:
+            duplicates = duplicates.filter(uploaded_by=user)
+        existing = duplicates.first()
+        if existing:
+            logger.info(f"Upload of {title} matches existing document {existing.id}, skipping processing")
+            return existing
+        
+        # Create the document record; file metadata comes straight from the
+        # upload so save() doesn't need to stat storage
+        document = Document.objects.create(
+            title=title,
+            description=description,
+            file=file,
+            file_type=os.path.splitext(file.name)[1][1:].lower(),
+            file_size=file.size,
+            content_sha256=content_sha256,
+            uploaded_by=user,
+            campaign=campaign,
+            status=Document.Status.PENDING
+        )
+        logger.info(f"Created Document record {document.id} for {title}")
+        
+        # Process the document once the record is committed
+        schedule_document_processing(document.id)
+        
+        return document
 
+    @staticmethod
+    def process_document(document_id):
+        """
+        Process an uploaded document and add it to the ChromaDB vector store.
+        
+        Args:
+            document_id: ID of the document to process
+            
+        Returns:
+            Document: The processed Document instance, or None if not found
+        """
+        try:
+            document = Document.objects.get(id=document_id)
+            document.update_status(Document.Status.PROCESSING)
+            
             # Process document in a transaction
             with transaction.atomic():
-                # Extract text from document
-                document_text = extract_text(document.file.path)
-                if not document_text:
+                # Extract text from document and split it into chunks
+                chunks = extract_chunks(document.file.path, chunk_size=1000, overlap=100)
+                if not chunks:
                     logger.error(f"Failed to extract text from document {document.id}")
-                    document.status = Document.Status.FAILED
-                    document.save(update_fields=['status'])
+                    document.update_status(Document.Status.FAILED)
                     return document
                 
-                # Split into chunks
-                chunks = chunk_text(document_text, chunk_size=1000, overlap=100)
                 logger.info(f"Split document {document.id} into {len(chunks)} chunks")
                 
-                # Create chunks in database
-                db_chunks = []
-                for idx, chunk in enumerate(chunks):
-                    # Extract page number if available (for PDFs)
-                    page_number = None
-                    chunk_content = chunk
-                    if isinstance(chunk, dict) and 'page' in chunk:
-                        page_number = chunk['page']
-                        chunk_content = chunk['text']
-                    
-                    # Create chunk object
-                    chunk_obj = {
-                        "text": chunk_content,
-                        "chunk_index": idx,
-                        "page_number": page_number
-                    }
-                    db_chunks.append(chunk_obj)
-                    
-                    # Create DB record (optional, we could just use ChromaDB)
-                    DocumentChunk.objects.create(
-                        document=document,
-                        chunk_index=idx,
-                        text=chunk_content,
-                        page_number=page_number
-                    )
+                # Store the chunks in the database
+                db_chunks = DocumentService._store_chunks(document, chunks)
                 
-                # Add chunks to ChromaDB vector store
+                # Add chunks to ChromaDB vector store. Vectors from an earlier
+                # run are removed first: add() skips IDs that already exist,
+                # and a run with fewer chunks would leave the rest behind.
                 vector_store = ChromaVectorStore()
-                success = vector_store.add_document(document.id, db_chunks)
+                vector_store.delete_document(document.id)
+                success = vector_store.add_document(document.id, db_chunks, document=document)
                 
                 if success:
-                    document.status = Document.Status.COMPLETE
-                    document.save(update_fields=['status'])
+                    document.update_status(Document.Status.COMPLETE)
                     logger.info(f"Successfully added document {document.id} to vector store")
                 else:
-                    document.status = Document.Status.FAILED
-                    document.save(update_fields=['status'])
+                    document.update_status(Document.Status.FAILED)
                     logger.error(f"Failed to add document {document.id} to vector store")
                 
                 return document
         
+        except Document.DoesNotExist:
+            logger.warning(f"Document {document_id} not found for processing")
+            return None
+        
         except Exception as e:
-            logger.error(f"Error in upload_document service: {str(e)}")
-            if document:
-                document.status = Document.Status.FAILED
-                document.save(update_fields=['status'])
+            logger.error(f"Error processing document {document_id}: {str(e)}")
+            # One UPDATE, whether or not the document was loaded before the error
+            updated = Document.objects.filter(id=document_id).update(
+                status=Document.Status.FAILED, updated_at=timezone.now()
+            )
+            if updated:
+                bump_search_cache_version(
+                    Document.objects.filter(id=document_id).values_list('campaign_id', flat=True)
+                )
+            else:
+                logger.warning(f"Document {document_id} no longer exists, could not mark it failed")
             raise
 
+    @staticmethod
+    def _store_chunks(document, chunks):
+        """
+        Replace a document's chunk rows with the given chunks
+        
+        The old rows are removed with a single DELETE and the new ones
+        inserted with batched multi-row INSERTs. Call inside a transaction.
+        Local search embeddings (one batched create_embeddings call) are only
+        computed when DOCUMENTS_LOCAL_SEARCH_EMBEDDINGS is on.
+        
+        Args:
+            document: Document the chunks belong to
+            chunks (list): Chunks from extract_chunks (strings or {'page', 'text'} dicts)
+            
+        Returns:
+            list: Chunk dicts with text, chunk_index and page_number, for the vector store
+        """
+        db_chunks = []
+        chunk_records = []
+        for idx, chunk in enumerate(chunks):
+            # Extract page number if available (for PDFs)
+            page_number = None
+            chunk_content = chunk
+            if isinstance(chunk, dict) and 'page' in chunk:
+                page_number = chunk['page']
+                chunk_content = chunk['text']
+            
+            # Create chunk object
+            db_chunks.append({
+                "text": chunk_content,
+                "chunk_index": idx,
+                "page_number": page_number
+            })
+            
+            # DB record (optional, we could just use ChromaDB)
+            chunk_records.append(DocumentChunk(
+                document=document,
+                chunk_index=idx,
+                text=chunk_content,
+                page_number=page_number
+            ))
+        
+        # Local search embeddings, only needed by the local search view
+        # (utils.search_documents); off by default so ingest doesn't load the
+        # local model and encode every chunk
+        if getattr(settings, 'DOCUMENTS_LOCAL_SEARCH_EMBEDDINGS', False):
+            embeddings = create_embeddings([chunk_obj["text"] for chunk_obj in db_chunks])
+            for chunk_record, embedding in zip(chunk_records, embeddings):
+                chunk_record.set_vector(embedding)
+        
+        # Replace any chunks left from an earlier run (nothing cascades from
+        # DocumentChunk, so this is a single DELETE)
+        DocumentChunk.objects.filter(document=document).delete()
+        DocumentChunk.objects.bulk_create(chunk_records, batch_size=500)
+        
+        return db_chunks
+
     @staticmethod
     def delete_document(document_id):
         """
@@ -118,13 +220,17 @@ class DocumentService:
         try:
             document = Document.objects.get(id=document_id)
             
-            # Delete from ChromaDB first
-            vector_store = ChromaVectorStore()
-            vector_store.delete_document(document_id)
+            # Capture what the cleanup needs before the row is gone
+            file_storage = document.file.storage
+            file_name = document.file.name
             
-            # Now delete from database
+            # Delete from database (chunks cascade)
             document.delete()
             
+            # Remove the stored file and the vectors in the background once
+            # the deletion commits
+            schedule_document_cleanup(document_id, file_storage, file_name)
+            
             logger.info(f"Successfully deleted document {document_id}")
             return True
         
@@ -179,8 +285,12 @@ class DocumentService:
             dict: Document details
         """
         try:
-            document = Document.objects.get(id=document_id)
-            chunks = document.chunks.all().order_by('chunk_index')
+            document = Document.objects.select_related('uploaded_by', 'campaign').get(id=document_id)
+            
+            # Fetch just the chunk columns in the response, as plain dicts
+            chunks = DocumentChunk.objects.filter(document=document).order_by('chunk_index').values(
+                'id', 'chunk_index', 'text', 'page_number'
+            )
             
             return {
                 'id': document.id,
@@ -194,15 +304,7 @@ class DocumentService:
                 'created_at': document.created_at,
                 'updated_at': document.updated_at,
                 'status': document.status,
-                'chunks': [
-                    {
-                        'id': chunk.id,
-                        'chunk_index': chunk.chunk_index,
-                        'text': chunk.text,
-                        'page_number': chunk.page_number
-                    }
-                    for chunk in chunks
-                ]
+                'chunks': list(chunks)
             }
         
         except Document.DoesNotExist:
@@ -213,12 +315,46 @@ class DocumentService:
             logger.error(f"Error getting document details for {document_id}: {str(e)}")
             return None
 
+    @staticmethod
+    def _document_chunks(document):
+        """
+        Get a document's chunks in vector store format
+        
+        Uses the chunks stored in the database. Documents that have none yet
+        are extracted and chunked again, and their chunk rows are stored, so
+        local search covers them too.
+        
+        Args:
+            document: Document instance
+            
+        Returns:
+            list: Chunk dicts with text, chunk_index and page_number
+        """
+        # Prefetched (ordered by chunk_index) by reindex_all_documents
+        stored = [
+            {"text": chunk.text, "chunk_index": chunk.chunk_index, "page_number": chunk.page_number}
+            for chunk in document.chunks.all()
+        ]
+        if stored:
+            return stored
+        
+        chunks = extract_chunks(document.file.path, chunk_size=1000, overlap=100)
+        if not chunks:
+            return []
+        
+        with transaction.atomic():
+            return DocumentService._store_chunks(document, chunks)
+
     @staticmethod
     def reindex_all_documents():
         """
         Reindex all documents in the ChromaDB vector store
         This is useful when changing embedding models or vector store settings
         
+        Chunks of several documents are embedded and added to ChromaDB
+        together, in flushes of about REINDEX_FLUSH_SIZE texts, instead of
+        making at least one request and one add per document.
+        
         Returns:
             bool: Success status
         """
@@ -227,48 +363,55 @@ class DocumentService:
             vector_store = ChromaVectorStore()
             vector_store.reset()
             
-            # Get all documents
-            documents = Document.objects.all()
-            logger.info(f"Reindexing {documents.count()} documents")
+            # Collect the ids up front: the loop below writes document
+            # statuses and chunk rows, which must not happen while a cursor
+            # over the documents table is still open on the same connection
+            document_ids = list(Document.objects.order_by('id').values_list('id', flat=True))
+            # Stored chunks (without embeddings), prefetched per batch
+            documents = Document.objects.order_by('id').prefetch_related(
+                Prefetch(
+                    'chunks',
+                    queryset=DocumentChunk.objects.only(
+                        'id', 'document_id', 'chunk_index', 'text', 'page_number'
+                    ).order_by('chunk_index')
+                )
+            )
+            logger.info(f"Reindexing {len(document_ids)} documents")
             
-            # Process each document
-            for document in documents:
-                # Extract text from document
-                document_text = extract_text(document.file.path)
-                if not document_text:
-                    logger.error(f"Failed to extract text from document {document.id}")
-                    continue
-                
-                # Split into chunks
-                chunks = chunk_text(document_text, chunk_size=1000, overlap=100)
-                
-                # Prepare chunks format
-                db_chunks = []
-                for idx, chunk_text in enumerate(chunks):
-                    # Extract page number if available
-                    page_number = None
-                    if isinstance(chunk_text, dict) and 'page' in chunk_text:
-                        page_number = chunk_text['page']
-                        chunk_text = chunk_text['text']
-                    
-                    # Create chunk
-                    chunk = {
-                        "text": chunk_text,
-                        "chunk_index": idx,
-                        "page_number": page_number
-                    }
-                    db_chunks.append(chunk)
-                
-                # Add to vector store
-                success = vector_store.add_document(document.id, db_chunks)
+            pending = []
+            pending_texts = []
+            
+            def flush():
+                # One embeddings pass and shared ChromaDB adds for the whole batch
+                success = vector_store.add_documents(pending, embeddings=embed_texts(pending_texts))
+                flushed_ids = [document.id for document, _ in pending]
+                status_value = Document.Status.COMPLETE if success else Document.Status.FAILED
+                Document.objects.filter(id__in=flushed_ids).update(status=status_value, updated_at=timezone.now())
+                bump_search_cache_version({document.campaign_id for document, _ in pending})
                 if success:
-                    document.status = Document.Status.COMPLETE
-                    document.save(update_fields=['status'])
-                    logger.info(f"Successfully reindexed document {document.id}")
+                    logger.info(f"Successfully reindexed {len(flushed_ids)} documents")
                 else:
-                    document.status = Document.Status.FAILED
-                    document.save(update_fields=['status'])
-                    logger.error(f"Failed to reindex document {document.id}")
+                    logger.error(f"Failed to reindex documents {flushed_ids}")
+                pending.clear()
+                pending_texts.clear()
+            
+            # Load documents in small batches by primary key; each batch is
+            # fully fetched (with its chunks in one query) before any writes
+            for start in range(0, len(document_ids), REINDEX_CHUNK_SIZE):
+                batch_ids = document_ids[start:start + REINDEX_CHUNK_SIZE]
+                for document in list(documents.filter(id__in=batch_ids)):
+                    db_chunks = DocumentService._document_chunks(document)
+                    if not db_chunks:
+                        logger.error(f"Failed to extract text from document {document.id}")
+                        continue
+                    
+                    pending.append((document, db_chunks))
+                    pending_texts.extend(chunk["text"] for chunk in db_chunks)
+                    if len(pending_texts) >= REINDEX_FLUSH_SIZE:
+                        flush()
+            
+            if pending:
+                flush()
             
             logger.info("Reindexing complete")
             return True
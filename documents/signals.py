@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from recorder.models import Campaign
+from .fts import ensure_fts_index
+
+# Cache key for the campaign_id -> owner user_id lookup used by the documents API
+CAMPAIGN_OWNER_CACHE_KEY = 'campowner:{}'
+
+@receiver([post_save, post_delete], sender=Campaign)
+def invalidate_campaign_owner(sender, instance, **kwargs):
+    """Drop the cached owner when a campaign changes or is deleted"""
+    cache.delete(CAMPAIGN_OWNER_CACHE_KEY.format(instance.pk))
+
+# Cached search results include this version in their key; bumping it makes
+# every cached result for the scope stale at once. Scopes are a campaign ID,
+# plus 'all' for searches without a campaign filter.
+SEARCH_CACHE_VERSION_KEY = 'searchver:{}'
+SEARCH_CACHE_ALL = 'all'
+
+def get_search_cache_version(campaign_id=None):
+    """Current search cache version for a campaign (or for unfiltered searches)"""
+    scope = campaign_id if campaign_id else SEARCH_CACHE_ALL
+    return cache.get(SEARCH_CACHE_VERSION_KEY.format(scope), 0)
+
+def bump_search_cache_version(campaign_ids=()):
+    """
+    Invalidate cached search results for the given campaigns
+    
+    Unfiltered searches can return chunks from any campaign, so their
+    version is always bumped too.
+    """
+    for scope in {SEARCH_CACHE_ALL, *(str(campaign_id) for campaign_id in campaign_ids if campaign_id)}:
+        key = SEARCH_CACHE_VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not set yet (or evicted): start above the default
+            cache.set(key, 1, None)
+
+@receiver([post_save, post_delete], sender='documents.Document')
+def invalidate_document_searches(sender, instance, **kwargs):
+    """Drop cached searches that may include a saved or deleted document"""
+    bump_search_cache_version([instance.campaign_id])
+
+# Applied to every new SQLite connection. WAL lets readers and the background
+# processing writer run concurrently, and with WAL synchronous=NORMAL only
+# fsyncs at checkpoints instead of on every commit (the database stays
+# consistent; only the last commits can be lost on power failure).
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Set the SQLite pragmas above on new connections"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+
+# The migration that creates the full-text index
+FTS_MIGRATION = ('documents', '0006_documentchunk_fts')
+
+@receiver(post_migrate)
+def repair_fts_index(sender, using, **kwargs):
+    """Put back full-text triggers dropped by a rebuild of the chunk table"""
+    if sender.name != 'documents':
+        return
+    connection = connections[using]
+    # Not after migrating back past the index (or before it exists)
+    if FTS_MIGRATION not in MigrationRecorder(connection).applied_migrations():
+        return
+    ensure_fts_index(connection)
@@ -0,0 +1,84 @@
+import logging
+from threading import Thread
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+def process_document_task(document_id):
+    """
+    Process a document (extract, chunk, and index) outside the request thread
+
+    Args:
+        document_id: ID of the Document to process
+    """
+    # Import here to avoid circular imports (services schedules this task)
+    from .services import DocumentService
+
+    try:
+        DocumentService.process_document(document_id)
+    except Exception as e:
+        logger.error(f"Background processing failed for document {document_id}: {str(e)}")
+    finally:
+        # This thread owns its own DB connection and ends here. Close it
+        # outright: close_old_connections() keeps it open until CONN_MAX_AGE.
+        connections.close_all()
+
+def schedule_document_processing(document_id):
+    """
+    Run process_document_task in a background thread once the current
+    transaction commits, so the request can return immediately.
+
+    Args:
+        document_id: ID of the Document to process
+    """
+    def start():
+        processing_thread = Thread(target=process_document_task, args=(document_id,))
+        processing_thread.daemon = True
+        processing_thread.start()
+
+    transaction.on_commit(start)
+
+def cleanup_deleted_document_task(document_id, file_storage, file_name):
+    """
+    Remove a deleted document's stored file and its vectors outside the request thread
+
+    Args:
+        document_id: ID of the deleted Document
+        file_storage: Storage the document's file was saved to
+        file_name (str): Name of the file in that storage (may be empty)
+    """
+    from .vector_store import ChromaVectorStore
+
+    try:
+        if file_name:
+            try:
+                file_storage.delete(file_name)
+            except Exception as e:
+                logger.warning(f"Could not delete file {file_name} of document {document_id}: {str(e)}")
+
+        if not ChromaVectorStore().delete_document(document_id):
+            logger.warning(f"Could not delete document {document_id} from ChromaDB")
+    except Exception as e:
+        logger.error(f"Background cleanup failed for document {document_id}: {str(e)}")
+    finally:
+        connections.close_all()
+
+def schedule_document_cleanup(document_id, file_storage, file_name):
+    """
+    Run cleanup_deleted_document_task in a background thread once the
+    deletion is committed, so the request doesn't wait on ChromaDB.
+
+    Args:
+        document_id: ID of the deleted Document
+        file_storage: Storage the document's file was saved to
+        file_name (str): Name of the file in that storage (may be empty)
+    """
+    def start():
+        cleanup_thread = Thread(
+            target=cleanup_deleted_document_task,
+            args=(document_id, file_storage, file_name),
+        )
+        cleanup_thread.daemon = True
+        cleanup_thread.start()
+
+    transaction.on_commit(start)
@@ -1,3 +1,289 @@
-from django.test import TestCase
+import hashlib
+import random
+import re
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recorder.models import Campaign
+from .fts import FTS_TRIGGERS, ensure_fts_index
+from .models import Document, DocumentChunk
+from .services import DocumentService
+from .utils import FTS_TABLE, chunk_text
+from .vector_store import ChromaVectorStore
+
+
+class FullTextIndexTests(TestCase):
+    """The FTS5 triggers keep the chunk index in step with DocumentChunk rows"""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("The full-text index only exists on SQLite")
+        user = User.objects.create_user(username='dm', password='pw')
+        self.document = Document.objects.create(
+            title='Rules', file='documents/rules.txt', file_type='txt', file_size=1, uploaded_by=user
+        )
+
+    def matching_ids(self, term):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [f'"{term}"'])
+            return {row[0] for row in cursor.fetchall()}
+
+    def create_chunk(self, index, text):
+        return DocumentChunk.objects.create(document=self.document, chunk_index=index, text=text)
+
+    def test_insert_is_indexed(self):
+        chunk = self.create_chunk(0, 'Opportunity attacks use your reaction')
+        self.assertEqual(self.matching_ids('reaction'), {chunk.id.hex})
+
+    def test_bulk_insert_is_indexed(self):
+        chunks = DocumentChunk.objects.bulk_create([
+            DocumentChunk(document=self.document, chunk_index=i, text=f'grapple check {i}') for i in range(3)
+        ])
+        self.assertEqual(self.matching_ids('grapple'), {chunk.id.hex for chunk in chunks})
+
+    def test_delete_is_removed(self):
+        kept = self.create_chunk(0, 'Concentration ends when you are incapacitated')
+        deleted = self.create_chunk(1, 'Concentration saves use Constitution')
+        deleted.delete()
+        self.assertEqual(self.matching_ids('concentration'), {kept.id.hex})
+        self.assertEqual(self.matching_ids('constitution'), set())
+
+    def test_replacing_chunks_reindexes(self):
+        # What _store_chunks does: one DELETE, then a bulk INSERT
+        self.create_chunk(0, 'old wording of the stealth rules')
+        DocumentChunk.objects.filter(document=self.document).delete()
+        new = self.create_chunk(0, 'new wording of the hiding rules')
+        self.assertEqual(self.matching_ids('stealth'), set())
+        self.assertEqual(self.matching_ids('hiding'), {new.id.hex})
+
+    def test_text_update_is_reindexed(self):
+        chunk = self.create_chunk(0, 'Cover gives a bonus')
+        chunk.text = 'Darkness imposes disadvantage'
+        chunk.save(update_fields=['text'])
+        self.assertEqual(self.matching_ids('cover'), set())
+        self.assertEqual(self.matching_ids('darkness'), {chunk.id.hex})
+
+    def test_document_delete_removes_chunks(self):
+        self.create_chunk(0, 'Exhaustion has six levels')
+        self.document.delete()
+        self.assertEqual(self.matching_ids('exhaustion'), set())
+
+    def drop_triggers(self):
+        # What a table rebuild by the schema editor leaves behind
+        with connection.cursor() as cursor:
+            for name in FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {name}")
+
+    def test_missing_triggers_are_recreated_and_index_rebuilt(self):
+        self.drop_triggers()
+        stale = self.create_chunk(0, 'Surprised creatures cannot act')
+        self.assertEqual(self.matching_ids('surprised'), set())
+
+        with self.assertLogs('documents.fts', 'WARNING'):
+            self.assertTrue(ensure_fts_index(connection))
+        self.assertEqual(self.matching_ids('surprised'), {stale.id.hex})
+        new = self.create_chunk(1, 'Surprised creatures cannot react')
+        self.assertEqual(self.matching_ids('surprised'), {stale.id.hex, new.id.hex})
+
+    def test_intact_index_is_left_alone(self):
+        self.assertFalse(ensure_fts_index(connection))
+
+    def test_rebuild_command(self):
+        self.drop_triggers()
+        chunk = self.create_chunk(0, 'Flanking is an optional rule')
+        with self.assertLogs('documents.fts', 'WARNING'):
+            call_command('rebuild_fts_index', stdout=StringIO())
+        self.assertEqual(self.matching_ids('flanking'), {chunk.id.hex})
+
+
+class UploadTestCase(TestCase):
+    """Authenticated client and a throwaway MEDIA_ROOT for upload tests"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        cache.clear()
+
+        self.user = User.objects.create_user(username='dm', password='pw')
+        self.campaign = Campaign.objects.create(user=self.user, name='Campaign')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('upload_document')
+
+    def upload(self, content=b'Rules text', campaign=None, idempotency_key=None):
+        data = {'file': SimpleUploadedFile('rules.txt', content), 'title': 'Rules'}
+        if campaign is not None:
+            data['campaign_id'] = str(campaign.id)
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else None
+        return self.client.post(self.url, data, format='multipart', headers=headers)
+
+
+class UploadDeduplicationTests(UploadTestCase):
+    """Uploads of the same file are deduplicated by content hash"""
+
+    def test_same_content_returns_existing_document(self):
+        first = self.upload()
+        second = self.upload()
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_different_content_creates_document(self):
+        self.upload(b'Rules text')
+        self.upload(b'Other rules text')
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_same_content_in_another_campaign_creates_document(self):
+        self.upload(campaign=self.campaign)
+        self.upload()
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_failed_duplicate_is_uploaded_again(self):
+        first = self.upload()
+        Document.objects.filter(id=first.data['id']).update(status=Document.Status.FAILED)
+        second = self.upload()
+        self.assertNotEqual(first.data['id'], second.data['id'])
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_stores_content_hash(self):
+        response = self.upload(b'Rules text')
+        document = Document.objects.get(id=response.data['id'])
+        self.assertEqual(document.content_sha256, hashlib.sha256(b'Rules text').hexdigest())
+
+
+class UploadIdempotencyTests(UploadTestCase):
+    """Retries with the same Idempotency-Key replay the first response"""
+
+    def test_idempotency_key_replays_first_response(self):
+        first = self.upload(b'Rules text', idempotency_key='upload-1')
+        # Different content with the same key must not create a document
+        second = self.upload(b'Other rules text', idempotency_key='upload-1')
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_idempotency_keys_are_per_user(self):
+        self.upload(b'Rules text', idempotency_key='upload-1')
+        other = User.objects.create_user(username='other', password='pw')
+        self.client.force_authenticate(other)
+        response = self.upload(b'Other rules text', idempotency_key='upload-1')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_idempotency_key_in_progress_conflicts(self):
+        cache.add(f'idem:{self.user.id}:upload-1', 'pending')
+        response = self.upload(idempotency_key='upload-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Document.objects.count(), 0)
+
+
+@override_settings(MAX_UPLOAD_SIZE=1024)
+class UploadSizeLimitTests(UploadTestCase):
+    """Oversized uploads get a 413 that cross-origin clients can read"""
+
+    def test_oversized_upload_is_rejected_with_cors_headers(self):
+        response = self.client.post(
+            self.url,
+            {'file': SimpleUploadedFile('rules.txt', b'x' * 2048), 'title': 'Rules'},
+            format='multipart',
+            headers={'Origin': 'https://app.example.com'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn('Access-Control-Allow-Origin', response.headers)
+        self.assertEqual(Document.objects.count(), 0)
+
+
+class VectorCleanupTests(TestCase):
+    """Every stored vector of a document is removed, whatever its chunk count"""
+
+    def test_delete_matches_document_metadata(self):
+        collection = mock.Mock()
+        with mock.patch.object(ChromaVectorStore, '_ensure_initialized'), \
+                mock.patch.object(ChromaVectorStore, '_collection', collection):
+            self.assertTrue(ChromaVectorStore.delete_document('doc-1'))
+        collection.delete.assert_called_once_with(where={'document_id': 'doc-1'})
+
+    def test_reprocessing_replaces_earlier_vectors(self):
+        user = User.objects.create_user(username='dm', password='pw')
+        document = Document.objects.create(
+            title='Rules', file='documents/rules.txt', file_type='txt', file_size=1, uploaded_by=user
+        )
+        store = mock.Mock()
+        store.add_document.return_value = True
+        with mock.patch('documents.services.ChromaVectorStore', return_value=store), \
+                mock.patch('documents.services.extract_chunks', return_value=['Only chunk']):
+            DocumentService.process_document(document.id)
+
+        self.assertEqual(
+            [call[0] for call in store.method_calls],
+            ['delete_document', 'add_document'],
+        )
+        store.delete_document.assert_called_once_with(document.id)
+        document.refresh_from_db()
+        self.assertEqual(document.status, Document.Status.COMPLETE)
+
+
+def reference_chunk_text(text, chunk_size=1000, overlap=200):
+    """chunk_text as it was before sentence breaks were found by bisection"""
+    if not text:
+        return []
+    text = re.sub(r'\s+', ' ', text).strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            sentence_break = text.rfind('. ', start, end)
+            if sentence_break != -1 and sentence_break > start + chunk_size // 2:
+                end = sentence_break + 1
+            else:
+                space_break = text.rfind(' ', start, end)
+                if space_break != -1 and space_break > start + chunk_size // 2:
+                    end = space_break
+        chunks.append(text[start:end].strip())
+        start = end - overlap if end < len(text) else len(text)
+    return chunks
+
+
+class ChunkTextTests(TestCase):
+    """chunk_text splits text exactly like the original rfind-based version"""
+
+    def random_text(self, rng, words):
+        vocabulary = ['the', 'goblin', 'attacks', 'with', 'advantage', 'Dr.', 'a', 'spell', 'slot', 'x' * 40]
+        separators = [' ', ' ', ' ', '. ', '.  ', '\n', '\t ', '.\n']
+        return ''.join(rng.choice(vocabulary) + rng.choice(separators) for _ in range(words))
+
+    def test_matches_reference_on_random_text(self):
+        rng = random.Random(1234)
+        for _ in range(200):
+            text = self.random_text(rng, rng.randint(0, 600))
+            chunk_size = rng.randint(20, 400)
+            overlap = rng.randint(0, chunk_size // 2)
+            self.assertEqual(
+                chunk_text(text, chunk_size=chunk_size, overlap=overlap),
+                reference_chunk_text(text, chunk_size=chunk_size, overlap=overlap),
+            )
+
+    def test_matches_reference_with_defaults(self):
+        text = ' '.join(f"Sentence number {i} is about grappling rules." for i in range(500))
+        self.assertEqual(chunk_text(text), reference_chunk_text(text))
+
+    def test_edge_cases(self):
+        for text in ('', '   ', 'one', 'A. B. C.', 'x' * 2500, '. ' * 800):
+            self.assertEqual(chunk_text(text, 100, 20), reference_chunk_text(text, 100, 20))
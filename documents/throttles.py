@@ -0,0 +1,6 @@
+from rest_framework.throttling import UserRateThrottle
+
+
+class UploadRateThrottle(UserRateThrottle):
+    """Per-user limit on document uploads, which trigger heavy background processing"""
+    scope = 'upload'
@@ -97,52 +97,63 @@ def search_campaign_documents_tool(query: str, campaign_id: str, limit: int = 5)
     logger.info(f"Found {len(formatted_results)} results for campaign document search")
     return formatted_results
 
-# Create function definitions for the OpenAI tool schema
-def get_search_rules_schema():
-    """Generate a valid schema for the search_rules_tool"""
-    return {
-        "name": "search_rules_tool", 
-        "description": "Search the D&D rules knowledge base for information",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "query": {
-                    "type": "string",
-                    "description": "The search query related to D&D rules"
-                },
-                "limit": {
-                    "type": "integer",
-                    "description": "Maximum number of results to return"
-                }
+# OpenAI tool schemas, built once at import (treat as read-only)
+SEARCH_RULES_SCHEMA = {
+    "name": "search_rules_tool", 
+    "description": "Search the D&D rules knowledge base for information",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "The search query related to D&D rules"
             },
-            "required": ["query"]
-        }
+            "limit": {
+                "type": "integer",
+                "description": "Maximum number of results to return"
+            }
+        },
+        "required": ["query"]
     }
+}
 
-def get_search_campaign_documents_schema():
-    """Generate a valid schema for the search_campaign_documents_tool"""
-    return {
-        "name": "search_campaign_documents_tool",
-        "description": "Search campaign-specific documents for information",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "query": {
-                    "type": "string",
-                    "description": "The search query for campaign documents"
-                },
-                "campaign_id": {
-                    "type": "string",
-                    "description": "The campaign ID to search within"
-                },
-                "limit": {
-                    "type": "integer",
-                    "description": "Maximum number of results to return"
-                }
+SEARCH_CAMPAIGN_DOCUMENTS_SCHEMA = {
+    "name": "search_campaign_documents_tool",
+    "description": "Search campaign-specific documents for information",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "The search query for campaign documents"
             },
-            "required": ["query", "campaign_id"]
-        }
+            "campaign_id": {
+                "type": "string",
+                "description": "The campaign ID to search within"
+            },
+            "limit": {
+                "type": "integer",
+                "description": "Maximum number of results to return"
+            }
+        },
+        "required": ["query", "campaign_id"]
     }
+}
+
+# Map the functions to their schema definitions
+AGENT_TOOLS = (
+    {"schema": SEARCH_RULES_SCHEMA, "function": search_rules_tool},
+    {"schema": SEARCH_CAMPAIGN_DOCUMENTS_SCHEMA, "function": search_campaign_documents_tool},
+)
+
+# Create function definitions for the OpenAI tool schema
+def get_search_rules_schema():
+    """Return the schema for the search_rules_tool"""
+    return SEARCH_RULES_SCHEMA
+
+def get_search_campaign_documents_schema():
+    """Return the schema for the search_campaign_documents_tool"""
+    return SEARCH_CAMPAIGN_DOCUMENTS_SCHEMA
 
 # Define functions to register with the Agent SDK
 def get_agent_tools():
@@ -150,12 +161,6 @@ def get_agent_tools():
     Get the tools to register with the OpenAI Agent
     
     Returns:
-        list: List of functions that can be used as tools
+        tuple: Tool definitions (schema and function), shared between calls
     """
-    # Map the functions to their schema definitions
-    tool_definitions = [
-        {"schema": get_search_rules_schema(), "function": search_rules_tool},
-        {"schema": get_search_campaign_documents_schema(), "function": search_campaign_documents_tool}
-    ]
-    
-    return tool_definitions 
\ No newline at end of file
+    return AGENT_TOOLS
@@ -1,22 +1,83 @@
 import os
 import re
-import PyPDF2
+import mmap
+import uuid
+import heapq
+import bisect
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
 import docx
 import numpy as np
 import faiss
+import torch
 import logging
 from django.conf import settings
+from django.db import DatabaseError, connection
 from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Any, Optional
-from django.db.models import Q, QuerySet
+from django.db.models import Q, QuerySet, Count, Max
 import json
 
 from .models import Document, DocumentChunk
+from .embedding_cache import cached_embeddings
+from .fts import FTS_TABLE
+from .pdf_extract import iter_page_texts
 
 logger = logging.getLogger(__name__)
 
 # Load the embedding model
 EMBEDDING_MODEL = None
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+_EMBEDDING_MODEL_LOCK = threading.Lock()
+
+# Number of chunks per forward pass when encoding
+EMBEDDING_BATCH_SIZE = 64
+
+# Query embeddings kept in the in-process LRU cache
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# HNSW parameters for the local chunk search index
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+# Candidate list size at query time (raised to 2*k for larger k)
+HNSW_EF_SEARCH = 64
+
+# Below this many vectors an exact matrix-vector product beats building an HNSW graph
+HNSW_MIN_VECTORS = 10000
+
+# HNSW searches fetch this many times k candidates, scored on quantized
+# vectors, and rerank them exactly; the extra candidates win back recall
+# lost to int8 quantization
+HNSW_RERANK_FACTOR = 4
+
+# Full-text candidates: how many BM25 matches are scored alongside the
+# approximate (HNSW) vector candidates
+FTS_CANDIDATES = 200
+
+# Query terms left out of the full-text MATCH: words that appear in nearly
+# every chunk would make the OR expression match (and BM25-rank) most of the
+# table without narrowing anything
+FTS_MIN_TERM_LENGTH = 3
+FTS_STOPWORDS = frozenset((
+    'a', 'about', 'after', 'all', 'also', 'an', 'and', 'any', 'are', 'as', 'at',
+    'be', 'been', 'but', 'by', 'can', 'could', 'did', 'do', 'does', 'for',
+    'from', 'had', 'has', 'have', 'he', 'her', 'his', 'how', 'if', 'in', 'into',
+    'is', 'it', 'its', 'may', 'me', 'my', 'no', 'not', 'of', 'on', 'or', 'our',
+    'she', 'should', 'so', 'some', 'than', 'that', 'the', 'their', 'them',
+    'then', 'there', 'these', 'they', 'this', 'those', 'to', 'up', 'was', 'we',
+    'were', 'what', 'when', 'where', 'which', 'who', 'why', 'will', 'with',
+    'would', 'you', 'your',
+))
+
+# Search indexes keyed by document filter: {key: (stamp, chunk_ids, matrix, index)}
+_SEARCH_INDEX_CACHE = {}
+
+# Normalized embedding matrices are also snapshotted here as memory-mapped
+# .npy files, so other worker processes and restarts map them instead of
+# reading every embedding from the database
+SEARCH_INDEX_DIR = getattr(settings, 'SEARCH_INDEX_DIR', os.path.join(settings.BASE_DIR, 'search_index'))
 
 def get_embedding_model():
     """
@@ -24,9 +85,19 @@ def get_embedding_model():
     """
     global EMBEDDING_MODEL
     if EMBEDDING_MODEL is None:
-        # Use a smaller model that's good for semantic search
-        # You can change this to a different model based on your needs
-        EMBEDDING_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
+        # The warmup thread and the first real use may race; load only once
+        with _EMBEDDING_MODEL_LOCK:
+            if EMBEDDING_MODEL is None:
+                # Run on the GPU in half precision when one is available
+                device = 'cuda' if torch.cuda.is_available() else 'cpu'
+                
+                # Use a smaller model that's good for semantic search
+                # You can change this to a different model based on your needs
+                model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+                if device == 'cuda':
+                    model = model.half()
+                logger.info(f"Loaded embedding model {EMBEDDING_MODEL_NAME} on {device}")
+                EMBEDDING_MODEL = model
     return EMBEDDING_MODEL
 
 def extract_text(file_path):
@@ -56,32 +127,69 @@ def extract_text(file_path):
         logger.error(f"Error extracting text from {file_path}: {str(e)}")
         raise
 
+def iter_pdf_pages(file_path):
+    """
+    Yield the text of a PDF one page at a time
+    
+    Large PDFs are extracted by a process pool (see pdf_extract).
+    
+    Args:
+        file_path (str): Path to the PDF
+        
+    Yields:
+        tuple: (page_number, text), with 1-based page numbers
+    """
+    yield from enumerate(iter_page_texts(file_path), start=1)
+
 def extract_text_from_pdf(file_path):
     """Extract text from PDF file"""
-    text = ""
-    with open(file_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-    return text
+    return "".join(text + "\n" for _, text in iter_pdf_pages(file_path))
 
 def extract_text_from_docx(file_path):
     """Extract text from DOCX file"""
     doc = docx.Document(file_path)
-    text = ""
-    for para in doc.paragraphs:
-        text += para.text + "\n"
-    return text
+    return "".join(para.text + "\n" for para in doc.paragraphs)
+
+def _read_text_file(file_path):
+    """
+    Read a UTF-8 text file through a memory map
+    
+    The text is decoded straight from the mapped pages, skipping the
+    intermediate bytes copy a regular read makes.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            # mmap can't map an empty file
+            return ""
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, 'utf-8')
 
 def extract_text_from_txt(file_path):
     """Extract text from plain text file"""
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read()
+    return _read_text_file(file_path)
 
 def extract_text_from_markdown(file_path):
     """Extract text from Markdown file"""
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read()
+    return _read_text_file(file_path)
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _query_embedding(query):
+    """
+    Embed a search query with the local model, caching the result per process
+    
+    Agents often repeat the same query within a session; a hit skips the
+    model forward pass entirely. Returned as immutable bytes so cached
+    values can't be modified by callers.
+    
+    Args:
+        query (str): Search query text
+        
+    Returns:
+        bytes: Raw float32 query embedding
+    """
+    return np.asarray(get_embedding_model().encode([query])[0], dtype=np.float32).tobytes()
+
+SENTENCE_BREAK_RE = re.compile(r'\. ')
 
 def chunk_text(text, chunk_size=1000, overlap=200):
     """
@@ -98,8 +206,13 @@ def chunk_text(text, chunk_size=1000, overlap=200):
     if not text:
         return []
         
-    # Clean the text by removing excessive whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    # Clean the text by removing excessive whitespace (split/join runs in C,
+    # no regex engine involved)
+    text = ' '.join(text.split())
+    
+    # Offsets of every sentence boundary ('. '), found in one pass, so each
+    # chunk can look up its last boundary by bisection instead of rescanning
+    sentence_breaks = [match.start() for match in SENTENCE_BREAK_RE.finditer(text)]
     
     # Initialize variables
     chunks = []
@@ -111,8 +224,9 @@ def chunk_text(text, chunk_size=1000, overlap=200):
         
         # If not at the end of the text, try to find a good breaking point
         if end < len(text):
-            # Try to break at sentence boundary
-            sentence_break = text.rfind('. ', start, end)
+            # Try to break at sentence boundary (the last '. ' ending within the window)
+            i = bisect.bisect_right(sentence_breaks, end - 2)
+            sentence_break = sentence_breaks[i - 1] if i else -1
             if sentence_break != -1 and sentence_break > start + chunk_size // 2:
                 end = sentence_break + 1  # Include the period
             else:
@@ -129,23 +243,76 @@ def chunk_text(text, chunk_size=1000, overlap=200):
     
     return chunks
 
+def chunk_pages(pages, chunk_size=1000, overlap=200):
+    """
+    Chunk a document page by page, so every chunk keeps its page number
+    
+    Args:
+        pages (iterable): (page_number, text) pairs, e.g. from iter_pdf_pages
+        chunk_size (int): Maximum size of each chunk
+        overlap (int): Overlap between chunks within a page
+        
+    Returns:
+        list: List of {'page': page_number, 'text': chunk} dicts
+    """
+    return [
+        {'page': page_number, 'text': chunk}
+        for page_number, text in pages
+        for chunk in chunk_text(text, chunk_size=chunk_size, overlap=overlap)
+    ]
+
+def extract_chunks(file_path, chunk_size=1000, overlap=200):
+    """
+    Extract and chunk a document
+    
+    PDFs are read and chunked one page at a time, so the full text is never
+    built up in memory and chunks carry their page number. Other file types
+    are extracted whole and chunked with chunk_text.
+    
+    Args:
+        file_path (str): Path to the document
+        chunk_size (int): Maximum size of each chunk
+        overlap (int): Overlap between chunks
+        
+    Returns:
+        list: Chunks, as strings or {'page', 'text'} dicts for PDFs
+    """
+    if os.path.splitext(file_path)[1].lower() == '.pdf':
+        try:
+            return chunk_pages(iter_pdf_pages(file_path), chunk_size=chunk_size, overlap=overlap)
+        except Exception as e:
+            logger.error(f"Error extracting text from {file_path}: {str(e)}")
+            raise
+    
+    return chunk_text(extract_text(file_path), chunk_size=chunk_size, overlap=overlap)
+
 def create_embeddings(text_chunks):
     """
     Create embeddings for chunks using SentenceTransformer
     
+    Embeddings go through the persistent cache (see
+    embedding_cache.cached_embeddings), so unchanged chunks are never
+    encoded twice; the remaining chunks go through a single batched
+    encode() call.
+    
     Args:
         text_chunks (list): List of text chunks
         
     Returns:
-        numpy.ndarray: Array of embeddings
+        numpy.ndarray: float32 array of shape (len(text_chunks), dimensions)
     """
     if not text_chunks:
-        return np.array([])
-        
-    model = get_embedding_model()
-    embeddings = model.encode(text_chunks)
+        return np.array([], dtype=np.float32)
     
-    return embeddings
+    def encode(texts):
+        return get_embedding_model().encode(
+            texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+    
+    return cached_embeddings(text_chunks, EMBEDDING_MODEL_NAME, encode)
 
 def create_faiss_index(embeddings):
     """
@@ -159,21 +326,48 @@ def create_faiss_index(embeddings):
     """
     if len(embeddings) == 0:
         return None
+    
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
         
     # Get the dimensionality of embeddings
     dimension = embeddings.shape[1]
     
-    # Create index - using L2 distance
-    index = faiss.IndexFlatL2(dimension)
-    
     # Normalize embeddings for cosine similarity search
     faiss.normalize_L2(embeddings)
     
-    # Add embeddings to the index
+    # Create index - inner product on normalized vectors, i.e. cosine
+    # similarity. Large corpora get an approximate HNSW index instead of an
+    # exhaustive scan.
+    if len(embeddings) >= HNSW_MIN_VECTORS:
+        return _build_hnsw_index(embeddings)
+    
+    index = faiss.IndexFlatIP(dimension)
     index.add(embeddings)
     
     return index
 
+def _build_hnsw_index(matrix):
+    """
+    Build an HNSW inner-product index over normalized vectors
+    
+    Vectors are stored int8 scalar-quantized (one byte per dimension
+    instead of four), so graph traversal reads a quarter of the memory.
+    Callers that need exact scores rerank the returned candidates against
+    the float32 matrix.
+    
+    Args:
+        matrix (numpy.ndarray): Normalized float32 vectors
+        
+    Returns:
+        faiss.IndexHNSWSQ: Trained index containing all rows
+    """
+    index = faiss.IndexHNSWSQ(matrix.shape[1], faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    # Learns the per-dimension value ranges used for quantization
+    index.train(matrix)
+    index.add(matrix)
+    return index
+
 def search_faiss_index(index, query_embedding, k=5):
     """
     Search for similar embeddings in a FAISS index
@@ -184,19 +378,275 @@ def search_faiss_index(index, query_embedding, k=5):
         k (int): Number of results to return
         
     Returns:
-        tuple: (distances, indices)
+        tuple: (similarities, indices), cosine similarities in descending order
     """
     if index is None:
         return np.array([]), np.array([])
         
     # Reshape and normalize query embedding for search
-    query_embedding = query_embedding.reshape(1, -1)
+    query_embedding = np.ascontiguousarray(query_embedding.reshape(1, -1), dtype=np.float32)
     faiss.normalize_L2(query_embedding)
     
     # Search the index
-    distances, indices = index.search(query_embedding, k)
+    similarities, indices = index.search(query_embedding, k, params=_search_params(index, k))
+    
+    return similarities, indices
+
+def _search_params(index, k):
+    """
+    Per-query search parameters for an index
+    
+    Passed to search() instead of setting index.hnsw.efSearch, so
+    concurrent searches on a shared cached index don't race.
+    
+    Args:
+        index (faiss.Index): FAISS index
+        k (int): Number of results requested
+        
+    Returns:
+        faiss.SearchParametersHNSW for HNSW indexes, otherwise None
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=max(HNSW_EF_SEARCH, 2 * k))
+    return None
+
+def top_k_indices(scores, k):
+    """
+    Get the indices of the k highest scores, best first
     
-    return distances, indices
+    Selection is O(n) with np.argpartition; only the k winners are sorted.
+    Plain Python sequences fall back to heapq.nlargest.
+    
+    Args:
+        scores (numpy.ndarray or list): Similarity scores
+        k (int): Number of indices to return
+        
+    Returns:
+        numpy.ndarray or list: Indices of the top k scores in descending order
+    """
+    if not isinstance(scores, np.ndarray):
+        return [i for i, _ in heapq.nlargest(k, enumerate(scores), key=lambda item: item[1])]
+    
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def _load_vectors(chunks, count):
+    """
+    Stream chunk embeddings into one preallocated float32 matrix
+    
+    Only the id and embedding columns are read, through a server-side
+    iterator, so peak memory is the matrix itself rather than every chunk
+    instance plus its raw bytes.
+    
+    Args:
+        chunks (QuerySet): DocumentChunk queryset (chunks without embeddings are skipped)
+        count (int): Expected number of rows, used to size the matrix
+        
+    Returns:
+        tuple: (chunk_ids, matrix), or (None, None) if there are no embeddings
+    """
+    chunk_ids = []
+    matrix = None
+    rows = chunks.exclude(embedding__isnull=True).order_by().values_list('id', 'embedding')
+    for chunk_id, embedding in rows.iterator(chunk_size=1000):
+        vector = np.frombuffer(embedding, dtype=np.float32)
+        if matrix is None:
+            matrix = np.empty((count, vector.shape[0]), dtype=np.float32)
+        if len(chunk_ids) == len(matrix):
+            # Rows were added after counting; pick them up on the next rebuild
+            break
+        matrix[len(chunk_ids)] = vector
+        chunk_ids.append(chunk_id)
+    
+    if not chunk_ids:
+        return None, None
+    return chunk_ids, matrix[:len(chunk_ids)]
+
+def _snapshot_paths(cache_key, stamp):
+    """
+    Return the (prefix, matrix path, ids path) of the on-disk snapshot for a chunk filter
+    
+    The stamp is part of the file name, so a snapshot is only ever read
+    for exactly the chunk set it was written from.
+    """
+    prefix = hashlib.sha256(cache_key.encode()).hexdigest()[:16]
+    latest = stamp[1].isoformat() if stamp[1] else ''
+    version = hashlib.sha256(f"{stamp[0]}:{latest}".encode()).hexdigest()[:16]
+    base = os.path.join(SEARCH_INDEX_DIR, f"{prefix}-{version}")
+    return prefix, f"{base}.f32.npy", f"{base}.ids.npy"
+
+def _read_snapshot(cache_key, stamp):
+    """
+    Map a previously written embedding snapshot, if there is one
+    
+    Args:
+        cache_key (str): Key identifying the chunk filter
+        stamp (tuple): (row count, latest updated_at) of the chunk set
+        
+    Returns:
+        tuple: (chunk_ids, matrix) with the matrix memory-mapped read-only,
+               or (None, None) if there is no usable snapshot
+    """
+    _, matrix_path, ids_path = _snapshot_paths(cache_key, stamp)
+    try:
+        matrix = np.load(matrix_path, mmap_mode='r')
+        ids = np.load(ids_path)
+    except (OSError, ValueError):
+        return None, None
+    if len(ids) != len(matrix):
+        return None, None
+    return [uuid.UUID(bytes=chunk_id) for chunk_id in ids.tolist()], matrix
+
+def _write_snapshot(cache_key, stamp, chunk_ids, matrix):
+    """
+    Write a normalized embedding matrix and its chunk IDs to disk
+    
+    Files are written under temporary names and renamed into place, so
+    readers never map a partial file. Snapshots of older versions of the
+    same filter are removed. Failures are logged and otherwise ignored;
+    the snapshot is only a cache.
+    
+    Args:
+        cache_key (str): Key identifying the chunk filter
+        stamp (tuple): (row count, latest updated_at) of the chunk set
+        chunk_ids (list): Chunk IDs, one per matrix row
+        matrix (np.ndarray): Normalized float32 embedding matrix
+    """
+    prefix, matrix_path, ids_path = _snapshot_paths(cache_key, stamp)
+    try:
+        os.makedirs(SEARCH_INDEX_DIR, exist_ok=True)
+        for path, array in (
+            (ids_path, np.array([chunk_id.bytes for chunk_id in chunk_ids], dtype='S16')),
+            (matrix_path, matrix),
+        ):
+            fd, tmp_path = tempfile.mkstemp(dir=SEARCH_INDEX_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        
+        current = {os.path.basename(matrix_path), os.path.basename(ids_path)}
+        for name in os.listdir(SEARCH_INDEX_DIR):
+            if name.startswith(f"{prefix}-") and name not in current:
+                os.remove(os.path.join(SEARCH_INDEX_DIR, name))
+    except OSError as e:
+        logger.warning(f"Could not write search index snapshot to {SEARCH_INDEX_DIR}: {str(e)}")
+
+def _get_search_index(chunks, cache_key):
+    """
+    Get (or build) the search index over the embeddings of the given chunks
+    
+    Embeddings are stacked into one L2-normalized float32 matrix. Large
+    corpora additionally get an HNSW index; smaller ones are ranked
+    exactly with a single matrix-vector product. Only chunk IDs are kept
+    alongside the matrix; result chunks are fetched when needed.
+    
+    The result is cached per cache_key and rebuilt only when the chunk set
+    changes (different row count or newer updated_at), so queries no longer
+    pay for loading vectors or building an index. The normalized matrix is
+    also snapshotted to SEARCH_INDEX_DIR; a process without a cached index
+    memory-maps the snapshot instead of reading the embeddings from the
+    database, and only touches the pages a search needs.
+    
+    Args:
+        chunks (QuerySet): DocumentChunk queryset to index
+        cache_key (str): Key identifying the chunk filter
+        
+    Returns:
+        tuple: (chunk_ids, matrix, index); index is None for small corpora,
+               and all three are None if there is nothing to index
+    """
+    stamp = chunks.aggregate(count=Count('id'), latest=Max('updated_at'))
+    stamp = (stamp['count'], stamp['latest'])
+    
+    cached = _SEARCH_INDEX_CACHE.get(cache_key)
+    if cached and cached[0] == stamp:
+        return cached[1:]
+    
+    chunk_ids, matrix = _read_snapshot(cache_key, stamp)
+    if matrix is None:
+        chunk_ids, matrix = _load_vectors(chunks, stamp[0])
+        if matrix is None:
+            return None, None, None
+        
+        # Normalize so rows can be compared by cosine similarity
+        faiss.normalize_L2(matrix)
+        _write_snapshot(cache_key, stamp, chunk_ids, matrix)
+    
+    # Approximate nearest neighbour index only pays off for large corpora
+    index = None
+    if len(chunk_ids) >= HNSW_MIN_VECTORS:
+        index = _build_hnsw_index(matrix)
+    
+    _SEARCH_INDEX_CACHE[cache_key] = (stamp, chunk_ids, matrix, index)
+    return chunk_ids, matrix, index
+
+def _full_text_candidates(chunks, query, limit=FTS_CANDIDATES):
+    """
+    Get the IDs of the chunks that best match the query terms by BM25
+    
+    Uses the SQLite FTS5 index on DocumentChunk.text (migration 0006).
+    Stopwords and very short terms are dropped from the MATCH expression.
+    Returns an empty list on other databases, if the index is missing or if
+    no content terms remain; search then relies on the vector candidates
+    alone. Only the local search (documents/views.py) goes through this.
+    
+    Args:
+        chunks (QuerySet): DocumentChunk queryset to restrict the candidates to
+        query (str): Search query
+        limit (int): Maximum number of candidates
+        
+    Returns:
+        list: Chunk IDs, best match first
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    
+    # Quote every term so user input can't break the FTS query syntax
+    terms = {
+        term for term in re.findall(r'\w+', query.lower())
+        if len(term) >= FTS_MIN_TERM_LENGTH and term not in FTS_STOPWORDS
+    }
+    if not terms:
+        return []
+    match = ' OR '.join(f'"{term}"' for term in sorted(terms))
+    
+    subquery, params = chunks.order_by().values('id').query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"AND id IN ({subquery}) ORDER BY rank LIMIT %s",
+                [match, *params, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+    except DatabaseError as e:
+        logger.warning(f"Full-text candidates unavailable: {str(e)}")
+        return []
+
+def _full_text_scores(chunks, query, query_vector):
+    """
+    Score the best full-text matches for the query by exact cosine similarity
+    
+    Args:
+        chunks (QuerySet): DocumentChunk queryset to restrict the candidates to
+        query (str): Search query
+        query_vector (np.ndarray): Normalized query embedding
+        
+    Returns:
+        dict: {chunk_id: similarity} for the candidates that have embeddings
+    """
+    candidate_ids = _full_text_candidates(chunks, query)
+    if not candidate_ids:
+        return {}
+    chunk_ids, matrix = _load_vectors(DocumentChunk.objects.filter(id__in=candidate_ids), len(candidate_ids))
+    if matrix is None:
+        return {}
+    faiss.normalize_L2(matrix)
+    return dict(zip(chunk_ids, (matrix @ query_vector).tolist()))
 
 def search_documents(query: str, document_filter: Optional[Q] = None, limit: int = 5) -> List[Dict[str, Any]]:
     """
@@ -219,45 +669,49 @@ def search_documents(query: str, document_filter: Optional[Q] = None, limit: int
     # Get chunks for filtered documents
     chunks = DocumentChunk.objects.filter(document__in=documents)
     
-    # If no chunks, return empty result
-    if not chunks.exists():
-        return []
-    
-    # Create a list of embeddings from stored chunks
-    embeddings_list = []
-    chunks_list = []
-    
-    for chunk in chunks:
-        try:
-            embedding = json.loads(chunk.embedding)
-            embeddings_list.append(embedding)
-            chunks_list.append(chunk)
-        except (json.JSONDecodeError, AttributeError):
-            # Skip chunks with invalid embeddings
-            continue
-    
-    if not embeddings_list:
+    # Get the cached index for this filter (rebuilt only if the chunks changed)
+    chunk_ids, matrix, index = _get_search_index(chunks, repr(document_filter))
+    if matrix is None:
         return []
     
-    # Convert to numpy array
-    embeddings_np = np.array(embeddings_list, dtype=np.float32)
-    
-    # Create FAISS index
-    index = faiss.IndexFlatL2(embeddings_np.shape[1])
-    index.add(embeddings_np)
-    
-    # Create query embedding
-    query_embedding = get_embedding_model().encode([query])[0]
+    # Create query embedding (copied, since normalize_L2 works in place)
+    query_embedding = np.frombuffer(_query_embedding(query), dtype=np.float32).reshape(1, -1).copy()
+    faiss.normalize_L2(query_embedding)
     
     # Search
-    k = min(limit, len(chunks_list))  # Return at most 'limit' results
-    D, I = index.search(np.array([query_embedding], dtype=np.float32), k)
+    k = min(limit, len(chunk_ids))  # Return at most 'limit' results
+    if index is not None:
+        n_candidates = min(k * HNSW_RERANK_FACTOR, len(chunk_ids))
+        _, I = index.search(query_embedding, n_candidates, params=_search_params(index, n_candidates))
+        # The index scores quantized vectors; rerank its candidates exactly
+        # and keep the best k
+        candidates = I[0][I[0] >= 0]
+        scores = matrix[candidates] @ query_embedding[0]
+        best = {chunk_ids[idx]: score for idx, score in zip(candidates.tolist(), scores.tolist())}
+        # The approximate search can miss close matches; the best full-text
+        # matches are scored exactly too and compete for the top k
+        best.update(_full_text_scores(chunks, query, query_embedding[0]))
+        hits = heapq.nlargest(k, ((score, chunk_id) for chunk_id, score in best.items()))
+    else:
+        # Exact cosine similarity for every chunk in one BLAS call. The rows are
+        # normalized once when the index is built, so this is a single sgemv;
+        # it is memory-bound, and a JIT-compiled loop (e.g. Numba) is no faster.
+        # This is already the exact top k, so full-text matches can't add to it.
+        scores = matrix @ query_embedding[0]
+        hits = [(scores[idx], chunk_ids[idx]) for idx in top_k_indices(scores, k)]
+    
+    # Fetch just the matched chunks, with only the columns the results use.
+    # Their document and campaign come in the same query.
+    matched = DocumentChunk.objects.select_related('document__campaign').only(
+        'id', 'text', 'page_number',
+        'document__id', 'document__title', 'document__campaign__id', 'document__campaign__name',
+    ).order_by().in_bulk([chunk_id for _, chunk_id in hits])
     
     # Format results
     results = []
-    for i, (distance, idx) in enumerate(zip(D[0], I[0])):
-        if idx < len(chunks_list):
-            chunk = chunks_list[idx]
+    for similarity, chunk_id in hits:
+        chunk = matched.get(chunk_id)
+        if chunk is not None:
             document = chunk.document
             
             results.append({
@@ -268,7 +722,7 @@ def search_documents(query: str, document_filter: Optional[Q] = None, limit: int
                 'chunk_id': chunk.id,
                 'chunk_text': chunk.text,
                 'page_number': chunk.page_number,
-                'similarity_score': float(1.0 / (1.0 + distance))  # Convert distance to similarity score
+                'similarity_score': float(similarity)  # Cosine similarity
             })
     
-    return results 
\ No newline at end of file
+    return results
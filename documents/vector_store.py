@@ -1,15 +1,77 @@
 import os
 import logging
 import uuid
+import threading
+import numpy as np
 import chromadb
 from chromadb.utils import embedding_functions
 from chromadb.config import Settings
 from django.conf import settings
 from openai import OpenAI
 from .models import Document, DocumentChunk
+from .embedding_cache import OPENAI_EMBEDDING_MODEL, embed_texts, embed_query
 
 logger = logging.getLogger(__name__)
 
+# Read once at import instead of on every (re)initialization
+COLLECTION_NAME = os.environ.get("CHROMA_COLLECTION_NAME", "dnd_rules")
+
+# When CHROMA_HOST is set, connect to a Chroma server (`chroma run --path
+# ./chroma_db`) instead of opening the database inside every worker process
+CHROMA_HOST = os.environ.get("CHROMA_HOST")
+CHROMA_PORT = int(os.environ.get("CHROMA_PORT", 8000))
+
+# HNSW settings for new collections (Chroma only applies them when a
+# collection is created, so existing collections keep theirs until reset,
+# e.g. by reindex_all_documents)
+HNSW_SPACE = os.environ.get("CHROMA_HNSW_SPACE", "cosine")
+HNSW_M = int(os.environ.get("CHROMA_HNSW_M", 24))
+HNSW_CONSTRUCTION_EF = int(os.environ.get("CHROMA_HNSW_CONSTRUCTION_EF", 128))
+HNSW_SEARCH_EF = int(os.environ.get("CHROMA_HNSW_SEARCH_EF", 100))
+
+# Records per collection.add() call; bounded so one large document (or a
+# reindex batch) never exceeds Chroma's maximum batch size
+ADD_BATCH_SIZE = 1000
+
+# Records between writes of the HNSW index to disk (must be >= ADD_BATCH_SIZE)
+HNSW_SYNC_THRESHOLD = 10000
+
+def collection_metadata():
+    """Metadata for creating the collection, including its HNSW settings"""
+    return {
+        "description": "D&D Rules and Campaign Documents",
+        "hnsw:space": HNSW_SPACE,
+        "hnsw:M": HNSW_M,
+        "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": HNSW_SEARCH_EF,
+        "hnsw:num_threads": os.cpu_count() or 1,
+        # Buffer a whole add batch before inserting it into the graph, and
+        # persist the index every few batches rather than every 1000 records
+        "hnsw:batch_size": ADD_BATCH_SIZE,
+        "hnsw:sync_threshold": HNSW_SYNC_THRESHOLD,
+    }
+
+def _relevance_scores(distances, space):
+    """Convert a list of Chroma distances into cosine similarities"""
+    distances = np.asarray(distances, dtype=np.float64)
+    if space in ("cosine", "ip"):
+        # Both are 1 - dot product (OpenAI embeddings are unit length)
+        return (1.0 - distances).tolist()
+    return (1.0 - distances * 0.5).tolist()
+
+class SharedClientOpenAIEmbeddingFunction(embedding_functions.OpenAIEmbeddingFunction):
+    """
+    Chroma's OpenAI embedding function, routed through embed_texts
+    
+    Anything Chroma embeds by itself then goes through the process-wide
+    pooled OpenAI client and the embedding cache, instead of the separate
+    client the stock function opens. Keeps the stock class (and its name) so
+    existing collections still match their stored configuration.
+    """
+    
+    def __call__(self, input):
+        return embed_texts(list(input)).tolist()
+
 class ChromaVectorStore:
     """
     ChromaDB vector store implementation for document storage and retrieval.
@@ -20,41 +82,68 @@ class ChromaVectorStore:
     _client = None
     _embedding_function = None
     _collection = None
+    _lock = threading.Lock()
     
-    # Singleton pattern to ensure we only have one connection to the ChromaDB
+    # Singleton pattern to ensure we only have one connection to the ChromaDB.
+    # Request threads and background processing threads can get here at the
+    # same time, so initialization is done under a lock and the instance is
+    # only published once the collection is ready.
     def __new__(cls):
+        cls._ensure_initialized()
         if cls._instance is None:
-            cls._instance = super(ChromaVectorStore, cls).__new__(cls)
-            cls._initialize()
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ChromaVectorStore, cls).__new__(cls)
         return cls._instance
     
+    @classmethod
+    def _ensure_initialized(cls):
+        """Initialize the client and collection once, even if several threads get here together"""
+        if cls._collection is None:
+            with cls._lock:
+                # _initialize() sets the collection last, so once it's set
+                # the client is ready too
+                if cls._collection is None:
+                    cls._initialize()
+    
     @classmethod
     def _initialize(cls):
         """Initialize the ChromaDB client and collection"""
         # Set up the ChromaDB client
-        persist_directory = os.path.join(settings.BASE_DIR, 'chroma_db')
-        os.makedirs(persist_directory, exist_ok=True)
-        
-        cls._client = chromadb.PersistentClient(
-            path=persist_directory,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
+        client_settings = Settings(
+            anonymized_telemetry=False,
+            allow_reset=True
         )
         
+        if CHROMA_HOST:
+            # Standalone Chroma server, shared by all worker processes
+            cls._client = chromadb.HttpClient(
+                host=CHROMA_HOST,
+                port=CHROMA_PORT,
+                settings=client_settings
+            )
+            logger.info(f"Connected to ChromaDB server at {CHROMA_HOST}:{CHROMA_PORT}")
+        else:
+            persist_directory = os.path.join(settings.BASE_DIR, 'chroma_db')
+            os.makedirs(persist_directory, exist_ok=True)
+            
+            cls._client = chromadb.PersistentClient(
+                path=persist_directory,
+                settings=client_settings
+            )
+        
         # Use OpenAI embedding function
         openai_api_key = os.environ.get("OPENAI_API_KEY")
         if not openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
         
-        cls._embedding_function = embedding_functions.OpenAIEmbeddingFunction(
+        cls._embedding_function = SharedClientOpenAIEmbeddingFunction(
             api_key=openai_api_key,
-            model_name="text-embedding-3-small"
+            model_name=OPENAI_EMBEDDING_MODEL
         )
         
         # Get or create the collection
-        collection_name = os.environ.get("CHROMA_COLLECTION_NAME", "dnd_rules")
+        collection_name = COLLECTION_NAME
         try:
             cls._collection = cls._client.get_collection(
                 name=collection_name,
@@ -65,64 +154,109 @@ class ChromaVectorStore:
             cls._collection = cls._client.create_collection(
                 name=collection_name,
                 embedding_function=cls._embedding_function,
-                metadata={"description": "D&D Rules and Campaign Documents"}
+                metadata=collection_metadata()
             )
             logger.info(f"Created new ChromaDB collection: {collection_name}")
     
+    @staticmethod
+    def _chunk_records(document, chunks):
+        """
+        Build the ChromaDB ids, texts and metadatas for a document's chunks
+        
+        Args:
+            document (Document): Document the chunks belong to
+            chunks (list): List of document chunks with text content
+            
+        Returns:
+            tuple: (ids, documents, metadatas) lists
+        """
+        ids = []
+        documents = []
+        metadatas = []
+        
+        # Per-document values, read once instead of per chunk. campaign_id
+        # comes straight from the foreign key, without loading the campaign
+        document_id = str(document.id)
+        document_title = document.title
+        file_type = document.file_type
+        campaign_id = str(document.campaign_id) if document.campaign_id else None
+        
+        for idx, chunk in enumerate(chunks):
+            ids.append(f"{document_id}_{idx}")
+            documents.append(chunk["text"])
+            
+            # Create metadata dictionary without None values
+            metadata = {
+                "document_id": document_id,
+                "document_title": document_title,
+                "chunk_index": idx,
+                "file_type": file_type,
+            }
+            
+            # Add optional fields only if they're not None
+            page_number = chunk.get("page_number")
+            if page_number is not None:
+                metadata["page_number"] = page_number
+            
+            # Only add campaign_id if campaign exists
+            if campaign_id:
+                metadata["campaign_id"] = campaign_id
+            
+            metadatas.append(metadata)
+        
+        return ids, documents, metadatas
+    
+    @classmethod
+    def _add_records(cls, ids, documents, metadatas, embeddings):
+        """Write records to the collection in ADD_BATCH_SIZE slices"""
+        batch_size = ADD_BATCH_SIZE
+        # Chroma rejects adds larger than its own limit
+        get_max_batch_size = getattr(cls._client, 'get_max_batch_size', None)
+        if get_max_batch_size is not None:
+            batch_size = min(batch_size, get_max_batch_size())
+        
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            cls._collection.add(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=embeddings[start:end].tolist()
+            )
+            logger.debug(f"Added records {start}-{min(end, len(ids))} of {len(ids)} to ChromaDB")
+    
     @classmethod
-    def add_document(cls, document_id, chunks):
+    def add_document(cls, document_id, chunks, embeddings=None, document=None):
         """
         Add document chunks to the vector store
         
         Args:
             document_id (str): Document ID
             chunks (list): List of document chunks with text content
+            embeddings (numpy.ndarray): Optional precomputed OpenAI embeddings,
+                one row per chunk
+            document (Document): Optional already loaded Document, to skip
+                looking it up again
             
         Returns:
             bool: Success status
         """
-        if not cls._collection:
-            cls._initialize()
+        cls._ensure_initialized()
         
         try:
             # Get document for metadata
-            document = Document.objects.get(id=document_id)
+            if document is None:
+                document = Document.objects.get(id=document_id)
             
             # Prepare data for ChromaDB
-            ids = []
-            documents = []
-            metadatas = []
-            
-            for idx, chunk in enumerate(chunks):
-                chunk_id = f"{document_id}_{idx}"
-                ids.append(chunk_id)
-                documents.append(chunk["text"])
-                
-                # Create metadata dictionary without None values
-                metadata = {
-                    "document_id": str(document_id),
-                    "document_title": document.title,
-                    "chunk_index": idx,
-                    "file_type": document.file_type,
-                }
-                
-                # Add optional fields only if they're not None
-                page_number = chunk.get("page_number")
-                if page_number is not None:
-                    metadata["page_number"] = page_number
-                
-                # Only add campaign_id if campaign exists
-                if document.campaign:
-                    metadata["campaign_id"] = str(document.campaign.id)
-                
-                metadatas.append(metadata)
+            ids, documents, metadatas = cls._chunk_records(document, chunks)
+            
+            # Embed all chunks in batched requests instead of leaving it to Chroma
+            if embeddings is None:
+                embeddings = embed_texts(documents)
             
             # Add to ChromaDB
-            cls._collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas
-            )
+            cls._add_records(ids, documents, metadatas, embeddings)
             
             logger.info(f"Added {len(chunks)} chunks from document {document_id} to ChromaDB")
             return True
@@ -131,6 +265,44 @@ class ChromaVectorStore:
             logger.error(f"Error adding document to ChromaDB: {str(e)}")
             return False
     
+    @classmethod
+    def add_documents(cls, entries, embeddings=None):
+        """
+        Add the chunks of several documents to the vector store together
+        
+        Records of all documents are written in shared ADD_BATCH_SIZE adds,
+        so many small documents don't each pay for their own add call.
+        
+        Args:
+            entries (list): (document, chunks) pairs
+            embeddings (numpy.ndarray): Optional precomputed OpenAI embeddings,
+                one row per chunk across all entries, in order
+            
+        Returns:
+            bool: Success status
+        """
+        cls._ensure_initialized()
+        
+        try:
+            ids, documents, metadatas = [], [], []
+            for document, chunks in entries:
+                document_ids, document_texts, document_metadatas = cls._chunk_records(document, chunks)
+                ids.extend(document_ids)
+                documents.extend(document_texts)
+                metadatas.extend(document_metadatas)
+            
+            if embeddings is None:
+                embeddings = embed_texts(documents)
+            
+            cls._add_records(ids, documents, metadatas, embeddings)
+            
+            logger.info(f"Added {len(ids)} chunks from {len(entries)} documents to ChromaDB")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error adding documents to ChromaDB: {str(e)}")
+            return False
+    
     @classmethod
     def search(cls, query, limit=15, filter_dict=None):
         """
@@ -144,8 +316,7 @@ class ChromaVectorStore:
         Returns:
             list: List of search results with document info and content
         """
-        if not cls._collection:
-            cls._initialize()
+        cls._ensure_initialized()
         
         try:
             # Convert filter_dict to ChromaDB format if provided
@@ -160,32 +331,40 @@ class ChromaVectorStore:
                 if not where_filter:
                     where_filter = None
             
-            # Search ChromaDB
+            # Search ChromaDB (query embeddings are cached)
             results = cls._collection.query(
-                query_texts=[query],
+                query_embeddings=[embed_query(query).tolist()],
                 n_results=limit,
                 where=where_filter,
                 include=["documents", "metadatas", "distances"]
             )
             
-            # Format results
-            formatted_results = []
-            
             if not results or not results["documents"]:
                 return []
-                
-            for i, doc in enumerate(results["documents"][0]):
-                metadata = results["metadatas"][0][i]
-                distance = results["distances"][0][i] if results.get("distances") else None
-                
-                formatted_results.append({
-                    "document_id": metadata.get("document_id"),
-                    "document_title": metadata.get("document_title"),
-                    "chunk_index": metadata.get("chunk_index"),
+            
+            documents = results["documents"][0]
+            metadatas = results["metadatas"][0]
+            
+            # Collections created before the HNSW settings use squared L2 on
+            # unit vectors (2 - 2*cos); cosine space returns 1 - cos
+            if results.get("distances"):
+                space = (cls._collection.metadata or {}).get("hnsw:space", "l2")
+                scores = _relevance_scores(results["distances"][0], space)
+            else:
+                scores = [None] * len(documents)
+            
+            # Format results
+            formatted_results = [
+                {
+                    "document_id": metadata["document_id"],
+                    "document_title": metadata["document_title"],
+                    "chunk_index": metadata["chunk_index"],
                     "page_number": metadata.get("page_number"),
                     "content": doc,
-                    "relevance_score": 1 - (distance / 2) if distance is not None else None  # Convert distance to score
-                })
+                    "relevance_score": score
+                }
+                for doc, metadata, score in zip(documents, metadatas, scores)
+            ]
             
             return formatted_results
             
@@ -198,14 +377,16 @@ class ChromaVectorStore:
         """
         Delete a document and all its chunks from the vector store
         
+        Matches on the document_id metadata rather than chunk IDs, so vectors
+        left from an earlier run with more chunks are removed as well.
+        
         Args:
             document_id (str): Document ID
             
         Returns:
             bool: Success status
         """
-        if not cls._collection:
-            cls._initialize()
+        cls._ensure_initialized()
         
         try:
             # Delete all chunks for this document
@@ -220,6 +401,26 @@ class ChromaVectorStore:
             logger.error(f"Error deleting document from ChromaDB: {str(e)}")
             return False
     
+    @classmethod
+    def get_collection_info(cls):
+        """
+        Get basic information about the ChromaDB collection
+        
+        Returns:
+            dict: Collection name and chunk count, or an error message
+        """
+        cls._ensure_initialized()
+        
+        try:
+            return {
+                "name": cls._collection.name,
+                "count": cls._collection.count()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error reading ChromaDB collection info: {str(e)}")
+            return {"error": str(e)}
+    
     @classmethod
     def reset(cls):
         """
@@ -229,11 +430,10 @@ class ChromaVectorStore:
         Returns:
             bool: Success status
         """
-        if not cls._client:
-            cls._initialize()
+        cls._ensure_initialized()
         
         try:
-            collection_name = os.environ.get("CHROMA_COLLECTION_NAME", "dnd_rules")
+            collection_name = COLLECTION_NAME
             cls._client.delete_collection(collection_name)
             logger.warning(f"Deleted ChromaDB collection: {collection_name}")
             
@@ -241,7 +441,7 @@ class ChromaVectorStore:
             cls._collection = cls._client.create_collection(
                 name=collection_name,
                 embedding_function=cls._embedding_function,
-                metadata={"description": "D&D Rules and Campaign Documents"}
+                metadata=collection_metadata()
             )
             logger.info(f"Recreated ChromaDB collection: {collection_name}")
             return True
@@ -2,22 +2,26 @@ from django.shortcuts import render, get_object_or_404
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from django.conf import settings
+from django.http import StreamingHttpResponse
 import os
 import numpy as np
 import faiss
 import json
 from typing import List, Dict, Any
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.db import transaction
 
 from .models import Document, DocumentChunk
+from .mixins import AutoPrefetchViewSetMixin
+from .tasks import schedule_document_processing
+from .services import DocumentService
 from .serializers import (
     DocumentSerializer, 
     DocumentListSerializer,
     DocumentSearchResultSerializer,
-    DocumentDetailSerializer,
-    ChunkSerializer
+    DocumentDetailSerializer
 )
 from .utils import (
     extract_text, 
@@ -42,15 +46,24 @@ class VectorStorePermission(permissions.BasePermission):
         # For all other actions, require authentication
         return request.user and request.user.is_authenticated
 
-class DocumentViewSet(viewsets.ModelViewSet):
+class DocumentViewSet(AutoPrefetchViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing documents"""
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
     permission_classes = [VectorStorePermission]
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # One aggregate JOIN instead of a COUNT query per document
+            queryset = queryset.annotate(chunk_count=Count('chunks'))
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return DocumentDetailSerializer
+        if self.action == 'list':
+            return DocumentListSerializer
         return DocumentSerializer
     
     # Override to disable authentication for specific actions
@@ -73,9 +86,20 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def chunks(self, request, pk=None):
         """Get all chunks for a specific document"""
         document = self.get_object()
-        chunks = document.chunks.all()
-        serializer = ChunkSerializer(chunks, many=True)
-        return Response(serializer.data)
+        # Read plain rows with ChunkSerializer's fields (skipping the embedding
+        # column) and stream them as a JSON array, so large documents don't
+        # build a model instance and serializer pass per chunk
+        rows = document.chunks.values('id', 'chunk_index', 'text', 'page_number').order_by('chunk_index')
+        
+        def generate():
+            yield b'['
+            for idx, row in enumerate(rows.iterator(chunk_size=500)):
+                if idx:
+                    yield b','
+                yield json.dumps(row, cls=JSONEncoder).encode('utf-8')
+            yield b']'
+        
+        return StreamingHttpResponse(generate(), content_type='application/json')
     
     @action(detail=False, methods=['get'])
     def search(self, request):
@@ -93,8 +117,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
             document_filter=Q(status=Document.Status.COMPLETE)
         )
         
-        serializer = DocumentSearchResultSerializer(results, many=True)
-        return Response(serializer.data)
+        # Results are plain dicts already shaped like DocumentSearchResultSerializer;
+        # the renderer handles the UUIDs, so skip per-field serialization
+        return Response(results)
     
     @action(detail=True, methods=['post'])
     def retry_processing(self, request, pk=None):
@@ -111,18 +136,16 @@ class DocumentViewSet(viewsets.ModelViewSet):
             # Clear existing chunks
             document.chunks.all().delete()
             # Reset status to pending
-            document.status = Document.Status.PENDING
-            document.save()
+            document.update_status(Document.Status.PENDING)
+            # Reprocess in the background once the reset is committed
+            schedule_document_processing(document.id)
         
-        # Processing will be handled by a background task
-        
-        return Response({"detail": "Document processing restarted"})
+        return Response({"detail": "Document processing restarted"}, status=status.HTTP_202_ACCEPTED)
         
     @action(detail=False, methods=['get'])
     def vector_store(self, request):
         """Get information about the OpenAI vector store"""
         try:
-            from .services import DocumentService
             vector_store_info = DocumentService.list_vector_store_contents()
             return Response(vector_store_info)
         except Exception as e:
@@ -135,7 +158,6 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def vector_store_files(self, request):
         """Get detailed information about files in the OpenAI vector store"""
         try:
-            from .services import DocumentService
             # Get basic vector store info
             vector_store_info = DocumentService.list_vector_store_contents()
             
@@ -143,9 +165,23 @@ class DocumentViewSet(viewsets.ModelViewSet):
             if "error" in vector_store_info:
                 return Response(vector_store_info)
                 
+            files = vector_store_info.get('files', [])
+            
+            # Look up the linked documents in one query instead of one per file
+            documents_by_file_id = {}
+            document_error = None
+            try:
+                file_ids = [file.get('file_id') for file in files if file.get('file_id')]
+                if file_ids:
+                    documents_by_file_id = Document.objects.only(
+                        'id', 'title', 'description', 'created_at', 'updated_at', 'status', 'openai_file_id'
+                    ).in_bulk(file_ids, field_name='openai_file_id')
+            except Exception as doc_error:
+                document_error = str(doc_error)
+            
             # Transform the response to focus on files with more details
             file_list = []
-            for file in vector_store_info.get('files', []):
+            for file in files:
                 file_details = {
                     'id': file.get('id'),
                     'file_id': file.get('file_id'),
@@ -156,21 +192,19 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 }
                 
                 # Add linked document information if available
-                try:
-                    file_id = file.get('file_id')
-                    if file_id:
-                        document = Document.objects.filter(openai_file_id=file_id).first()
-                        if document:
-                            file_details['document'] = {
-                                'id': str(document.id),
-                                'title': document.title,
-                                'description': document.description,
-                                'created_at': document.created_at,
-                                'updated_at': document.updated_at,
-                                'status': document.status,
-                            }
-                except Exception as doc_error:
-                    file_details['document_error'] = str(doc_error)
+                if document_error is not None:
+                    file_details['document_error'] = document_error
+                else:
+                    document = documents_by_file_id.get(file.get('file_id'))
+                    if document:
+                        file_details['document'] = {
+                            'id': str(document.id),
+                            'title': document.title,
+                            'description': document.description,
+                            'created_at': document.created_at,
+                            'updated_at': document.updated_at,
+                            'status': document.status,
+                        }
                 
                 file_list.append(file_details)
             
@@ -203,7 +237,6 @@ class DocumentViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            from .services import DocumentService
             search_results = DocumentService.search_vector_store(
                 query=query,
                 filters=filters,
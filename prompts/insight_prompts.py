@@ -2,67 +2,84 @@
 Insight generation prompts for D&D transcriptions.
 """
 
+from functools import lru_cache
+
+# Static parts of the prompts, built once at import rather than on every call
+_REGULAR_PREAMBLE = (
+    "Analyze the following D&D discussion snippets. Identify if any specific D&D 5e rule is being discussed, "
+    "implied, or might be relevant. "
+    "Use the search_rules_tool to search the ChromaDB vector database for relevant rules first. "
+    "Prioritize information from the vector database over your general knowledge. "
+    "If a rule is relevant, respond ONLY with a concise explanation or application of that rule, focusing strictly on mechanics or outcome. Start the response directly with the rule explanation. "
+    "Avoid mentioning the snippets, searching, or conversational filler. "
+    "If providing a rule insight, conclude your response with a one-sentence summary labeled 'TL;DR:'. "
+    "If you determine that no specific rule is relevant to the discussion, respond ONLY with the exact phrase: No Insight right now "
+)
+
+_REGULAR_PREVIOUS_TAIL = (
+    "\"\n"
+    "Only provide a new insight if the discussion has moved to a different rule or aspect. "
+    "If there's nothing significantly new to add, respond with 'No Insight right now'.\n\n"
+)
+
+_FORCED_PREAMBLE = (
+    "Analyze the following D&D discussion snippets. Identify the MOST relevant D&D 5e rule, even if the connection is weak. "
+    "Use the search_rules_tool to search the ChromaDB vector database for relevant rules first. "
+    "Prioritize information from the vector database over your general knowledge. "
+    "Respond ONLY with a concise explanation or application of that rule, focusing strictly on mechanics or outcome. "
+    "Do NOT mention the snippets, searching, or conversational filler. Start your response directly with the rule explanation. "
+    "Conclude your response with a one-sentence summary labeled 'TL;DR:'. "
+)
+
+_FORCED_PREVIOUS_TAIL = (
+    "\"\n"
+    "If the same rule is still relevant, elaborate on it rather than repeating information. "
+    "If a completely different rule is now more relevant, focus on that instead.\n\n"
+)
+
+_PREVIOUS_HEAD = "Previously, you identified this insight: \""
+
+_SNIPPETS_HEAD = "Discussion Snippets:\n\n"
+
+
+@lru_cache(maxsize=64)
+def _prompt_prefix(preamble, previous_tail, previous_insight):
+    """
+    Everything before the snippets. The previous insight usually stays the
+    same across consecutive polls, so this is cached on it.
+    """
+    if not previous_insight:
+        return preamble + _SNIPPETS_HEAD
+    return "".join((preamble, _PREVIOUS_HEAD, previous_insight, previous_tail, _SNIPPETS_HEAD))
+
+
+def _build_prompt(preamble, previous_tail, combined_text, previous_insight):
+    return _prompt_prefix(preamble, previous_tail, previous_insight or None) + combined_text
+
+
 def get_regular_insight_prompt(combined_text, previous_insight=None):
     """
     Returns the prompt for generating regular insights from transcriptions.
-    
+
     Args:
         combined_text (str): The combined transcription text to analyze
         previous_insight (str, optional): The previous insight text
-        
+
     Returns:
         str: The formatted prompt
     """
-    prompt = (
-        "Analyze the following D&D discussion snippets. Identify if any specific D&D 5e rule is being discussed, "
-        "implied, or might be relevant. "
-        "Use the search_rules_tool to search the ChromaDB vector database for relevant rules first. "
-        "Prioritize information from the vector database over your general knowledge. "
-        "If a rule is relevant, respond ONLY with a concise explanation or application of that rule, focusing strictly on mechanics or outcome. Start the response directly with the rule explanation. "
-        "Avoid mentioning the snippets, searching, or conversational filler. "
-        "If providing a rule insight, conclude your response with a one-sentence summary labeled 'TL;DR:'. "
-        "If you determine that no specific rule is relevant to the discussion, respond ONLY with the exact phrase: No Insight right now "
-    )
-    
-    if previous_insight:
-        prompt += (
-            f"Previously, you identified this insight: \"{previous_insight}\"\n"
-            "Only provide a new insight if the discussion has moved to a different rule or aspect. "
-            "If there's nothing significantly new to add, respond with 'No Insight right now'.\n\n"
-        )
-    
-    prompt += f"Discussion Snippets:\n\n{combined_text}"
-    
-    return prompt
+    return _build_prompt(_REGULAR_PREAMBLE, _REGULAR_PREVIOUS_TAIL, combined_text, previous_insight)
 
 
 def get_forced_insight_prompt(combined_text, previous_insight=None):
     """
     Returns the prompt for generating forced insights from transcriptions.
-    
+
     Args:
         combined_text (str): The combined transcription text to analyze
         previous_insight (str, optional): The previous insight text
-        
+
     Returns:
         str: The formatted prompt
     """
-    prompt = (
-        "Analyze the following D&D discussion snippets. Identify the MOST relevant D&D 5e rule, even if the connection is weak. "
-        "Use the search_rules_tool to search the ChromaDB vector database for relevant rules first. "
-        "Prioritize information from the vector database over your general knowledge. "
-        "Respond ONLY with a concise explanation or application of that rule, focusing strictly on mechanics or outcome. "
-        "Do NOT mention the snippets, searching, or conversational filler. Start your response directly with the rule explanation. "
-        "Conclude your response with a one-sentence summary labeled 'TL;DR:'. "
-    )
-    
-    if previous_insight:
-        prompt += (
-            f"Previously, you identified this insight: \"{previous_insight}\"\n"
-            "If the same rule is still relevant, elaborate on it rather than repeating information. "
-            "If a completely different rule is now more relevant, focus on that instead.\n\n"
-        )
-    
-    prompt += f"Discussion Snippets:\n\n{combined_text}"
-    
-    return prompt 
\ No newline at end of file
+    return _build_prompt(_FORCED_PREAMBLE, _FORCED_PREVIOUS_TAIL, combined_text, previous_insight)
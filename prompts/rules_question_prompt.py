@@ -2,23 +2,26 @@
 Prompt for handling D&D rules questions.
 """
 
+_RULES_QUESTION_PREAMBLE = (
+    "You are a D&D 5e rules assistant. Answer the following question clearly and concisely. "
+    "Use the search_rules_tool to search the ChromaDB vector database of D&D rules first. "
+    "If the question might involve campaign-specific content, also use search_campaign_documents_tool. "
+    "Prioritize information from the vector database over your general knowledge. "
+    "Only use the WebSearchTool as a last resort if you can't find relevant information in the vector database. "
+    "Focus strictly on the rules mechanics or outcomes. "
+    "Provide a comprehensive answer but avoid unnecessary verbosity.\n\n"
+    "Question: "
+)
+
+
 def get_rules_question_prompt(question):
     """
     Returns the prompt for answering D&D rules questions.
-    
+
     Args:
         question (str): The user's question about D&D rules
-        
+
     Returns:
         str: The formatted prompt
     """
-    return (
-        "You are a D&D 5e rules assistant. Answer the following question clearly and concisely. "
-        "Use the search_rules_tool to search the ChromaDB vector database of D&D rules first. "
-        "If the question might involve campaign-specific content, also use search_campaign_documents_tool. "
-        "Prioritize information from the vector database over your general knowledge. "
-        "Only use the WebSearchTool as a last resort if you can't find relevant information in the vector database. "
-        "Focus strictly on the rules mechanics or outcomes. "
-        "Provide a comprehensive answer but avoid unnecessary verbosity.\n\n"
-        f"Question: {question}"
-    ) 
\ No newline at end of file
+    return _RULES_QUESTION_PREAMBLE + str(question)
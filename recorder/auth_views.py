@@ -1,12 +1,44 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+# Inserts a token for the user, or leaves the existing one in place, and
+# returns whichever key is now stored. The no-op DO UPDATE is needed for
+# RETURNING to yield the existing row on conflict.
+TOKEN_UPSERT_SQL = (
+    f"INSERT INTO {Token._meta.db_table} (key, user_id, created) VALUES (%s, %s, %s) "
+    "ON CONFLICT (user_id) DO UPDATE SET user_id = excluded.user_id "
+    "RETURNING key"
+)
+
+def get_token_key(user):
+    """
+    Get the user's auth token key, creating the token if it doesn't exist
+
+    Uses a single INSERT ... ON CONFLICT ... RETURNING statement on SQLite
+    and PostgreSQL instead of get_or_create's SELECT followed by an INSERT.
+
+    Args:
+        user (User): The user to get the token for
+
+    Returns:
+        str: The token key
+    """
+    if connection.vendor not in ('sqlite', 'postgresql') or not connection.features.can_return_columns_from_insert:
+        token, _ = Token.objects.get_or_create(user=user)
+        return token.key
+
+    with connection.cursor() as cursor:
+        cursor.execute(TOKEN_UPSERT_SQL, [Token.generate_key(), user.pk, connection.ops.adapt_datetimefield_value(timezone.now())])
+        return cursor.fetchone()[0]
+
+
 class RegisterView(APIView):
     """
     API view for user registration.
@@ -31,8 +63,8 @@ class RegisterView(APIView):
                 password=password
             )
 
-            # Create token
-            token, _ = Token.objects.get_or_create(user=user)
+            # Create token; a new user can't have one yet
+            token = Token.objects.create(user=user)
 
             return Response({
                 'user_id': user.id,
@@ -75,13 +107,13 @@ class LoginView(APIView):
             }, status=status.HTTP_401_UNAUTHORIZED)
 
         # Get or create token
-        token, _ = Token.objects.get_or_create(user=user)
+        token_key = get_token_key(user)
 
         return Response({
             'user_id': user.id,
             'username': user.username,
             'email': user.email,
-            'token': token.key
+            'token': token_key
         })
 
 
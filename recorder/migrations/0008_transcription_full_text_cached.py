@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-15 11:00
+
+from django.db import migrations, models
+
+
+def build_full_text(text, words_json):
+    # Same as Transcription.build_full_text (historical models don't have it)
+    if not words_json:
+        return text
+    return ' '.join(
+        f"({word['text']})" if word['type'] == 'audio_event' else word['text']
+        for word in words_json
+    )
+
+
+def backfill_full_text(apps, schema_editor):
+    Transcription = apps.get_model('recorder', 'Transcription')
+    batch = []
+    for transcription in Transcription.objects.only('id', 'text', 'words_json').iterator(chunk_size=500):
+        transcription.full_text_cached = build_full_text(transcription.text, transcription.words_json)
+        batch.append(transcription)
+        if len(batch) >= 500:
+            Transcription.objects.bulk_update(batch, ['full_text_cached'])
+            batch = []
+    if batch:
+        Transcription.objects.bulk_update(batch, ['full_text_cached'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recorder', '0007_npc'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcription',
+            name='full_text_cached',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_full_text, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.conf import settings
 import uuid
+from operator import itemgetter
 
 # Create your models here.
 
@@ -21,11 +24,22 @@ class Campaign(models.Model):
         if self.user:
             return f"{self.name} (User: {self.user.username})"
         return f"{self.name} (User: Unknown)"
-    
-    @property
-    def document_count(self):
-        """Return the number of documents associated with this campaign"""
-        return self.documents.count()
+
+
+class RecordingSessionQuerySet(models.QuerySet):
+    def with_session_number(self):
+        """
+        Annotate each session with its 1-based number within its campaign
+
+        The number is computed by the database with a window function. Only
+        filter this queryset on whole campaigns: the window numbers the rows
+        left after filtering, so e.g. filtering to one session would make it 1.
+        """
+        return self.annotate(session_number=Window(
+            expression=RowNumber(),
+            partition_by=F('campaign_id'),
+            order_by=F('created_at').asc(),
+        ))
 
 
 class RecordingSession(models.Model):
@@ -37,23 +51,32 @@ class RecordingSession(models.Model):
     latest_insight_timestamp = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
 
+    objects = RecordingSessionQuerySet.as_manager()
+
     class Meta:
         # Order sessions within a campaign by creation time
         ordering = ['created_at']
 
+    def get_session_number(self):
+        """
+        Return this session's 1-based number within its campaign
+
+        Uses the session_number annotation when the session was loaded with
+        with_session_number(), otherwise counts the earlier sessions (one query).
+        """
+        session_number = getattr(self, 'session_number', None)
+        if session_number is not None:
+            return session_number
+        return RecordingSession.objects.filter(
+            campaign_id=self.campaign_id, created_at__lt=self.created_at
+        ).count() + 1
+
     def __str__(self):
         # Try to determine session number within the campaign
         try:
             # Ensure campaign object exists before accessing related sessions
             if self.campaign:
-                 # Note: This can be inefficient if you have many sessions per campaign
-                session_ids = list(self.campaign.sessions.order_by('created_at').values_list('id', flat=True))
-                try:
-                    session_index = session_ids.index(self.id) + 1
-                    return f"Session {session_index} ({self.campaign.name})"
-                except ValueError:
-                    # Should not happen if self.id is in the list, but handle defensively
-                     return f"Session {self.id} ({self.campaign.name})"
+                return f"Session {self.get_session_number()} ({self.campaign.name})"
             else:
                 return f"Orphaned Session {self.id}"
         except Exception as e: # Catch potential exceptions during related object access
@@ -61,6 +84,9 @@ class RecordingSession(models.Model):
              return f"Session {self.id} (Error determining campaign)"
 
 
+_WORD_TYPE_AND_TEXT = itemgetter('type', 'text')
+
+
 class Transcription(models.Model):
     session = models.ForeignKey(RecordingSession, on_delete=models.CASCADE, related_name='transcriptions', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -70,6 +96,8 @@ class Transcription(models.Model):
     language_probability = models.FloatField(null=True, blank=True)
     words_json = models.JSONField(null=True, blank=True)  # Store the detailed word information
     generated_insight_text = models.TextField(null=True, blank=True) # Insight generated after this chunk
+    # full_text, built from words_json when the row is saved
+    full_text_cached = models.TextField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
@@ -77,21 +105,34 @@ class Transcription(models.Model):
     def __str__(self):
         return f"Session {self.session.name} - Chunk {self.chunk_number}"
     
+    def build_full_text(self):
+        """Build the full text from the word information, falling back to the plain text."""
+        words = self.words_json
+        if not words:
+            return self.text
+        
+        # Combine words with appropriate spacing, audio events in parentheses
+        return ' '.join(
+            f"({text})" if word_type == 'audio_event' else text
+            for word_type, text in map(_WORD_TYPE_AND_TEXT, words)
+        )
+    
+    def save(self, *args, **kwargs):
+        # Rebuild the stored full text unless only other fields are being saved
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'words_json', 'text'} & set(update_fields):
+            self.full_text_cached = self.build_full_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'full_text_cached'}
+        super().save(*args, **kwargs)
+    
     @property
     def full_text(self):
         """Returns the full text as a properly formatted string."""
-        if not self.words_json:
-            return self.text
-        
-        # Combine words with appropriate spacing
-        text_parts = []
-        for word in self.words_json:
-            if word['type'] == 'audio_event':
-                text_parts.append(f"({word['text']})")
-            else:
-                text_parts.append(word['text'])
-        
-        return ' '.join(text_parts)
+        if self.full_text_cached is not None:
+            return self.full_text_cached
+        # Rows written without save() (e.g. bulk_create) don't have it stored
+        return self.build_full_text()
 
 
 class NPC(models.Model):
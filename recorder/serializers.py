@@ -19,18 +19,32 @@ class RecordingSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'campaign', 'created_at', 'latest_insight_timestamp', 'session_number']
 
     def get_session_number(self, obj):
+        # Free when the queryset used with_session_number(), one COUNT otherwise
         try:
-            if obj.campaign:
-                session_ids = list(obj.campaign.sessions.order_by('created_at').values_list('id', flat=True))
-                try:
-                    return session_ids.index(obj.id) + 1
-                except ValueError:
-                    return None
+            if obj.campaign_id:
+                return obj.get_session_number()
             return None
         except Exception:
             return None
 
-class CampaignSerializer(serializers.ModelSerializer):
+class CampaignCountsMixin:
+    """
+    session_count and document_count for campaigns
+
+    Read from the annotations CampaignViewSet adds to its queryset, so a
+    list of campaigns doesn't run two COUNT queries per campaign. Instances
+    without them (e.g. one that was just created) are counted directly.
+    """
+
+    def get_session_count(self, obj):
+        session_count = getattr(obj, 'session_count', None)
+        return session_count if session_count is not None else obj.sessions.count()
+
+    def get_document_count(self, obj):
+        document_count = getattr(obj, 'document_count', None)
+        return document_count if document_count is not None else obj.documents.count()
+
+class CampaignSerializer(CampaignCountsMixin, serializers.ModelSerializer):
     sessions = RecordingSessionSerializer(many=True, read_only=True)
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     session_count = serializers.SerializerMethodField()
@@ -43,13 +57,7 @@ class CampaignSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 
                            'session_count', 'document_count', 'sessions']
 
-    def get_session_count(self, obj):
-        return obj.sessions.count()
-        
-    def get_document_count(self, obj):
-        return obj.documents.count()
-
-class CampaignListSerializer(serializers.ModelSerializer):
+class CampaignListSerializer(CampaignCountsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     session_count = serializers.SerializerMethodField()
     document_count = serializers.SerializerMethodField()
@@ -61,12 +69,6 @@ class CampaignListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 
                            'session_count', 'document_count']
 
-    def get_session_count(self, obj):
-        return obj.sessions.count()
-        
-    def get_document_count(self, obj):
-        return obj.documents.count()
-
 class NPCSerializer(serializers.ModelSerializer):
     campaign = serializers.PrimaryKeyRelatedField(read_only=True)
 
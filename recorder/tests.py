@@ -1,3 +1,174 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from threading import Thread
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import views
+from .auth_views import get_token_key
+from .models import Campaign, RecordingSession, Transcription
+
+
+WORDS = [
+    {'type': 'word', 'text': 'Roll'},
+    {'type': 'word', 'text': 'initiative'},
+    {'type': 'audio_event', 'text': 'dice rolling'},
+]
+
+
+class TokenKeyTests(TestCase):
+    """get_token_key creates the token once and then keeps returning it"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='pw')
+
+    def test_creates_token(self):
+        key = get_token_key(self.user)
+        self.assertEqual(Token.objects.get(user=self.user).key, key)
+
+    def test_repeated_calls_return_same_key(self):
+        key = get_token_key(self.user)
+        self.assertEqual(get_token_key(self.user), key)
+        self.assertEqual(Token.objects.filter(user=self.user).count(), 1)
+
+    def test_keeps_existing_token(self):
+        token = Token.objects.create(user=self.user)
+        self.assertEqual(get_token_key(self.user), token.key)
+        self.assertEqual(Token.objects.filter(user=self.user).count(), 1)
+
+    def test_tokens_are_per_user(self):
+        other = User.objects.create_user(username='other', password='pw')
+        self.assertNotEqual(get_token_key(self.user), get_token_key(other))
+        self.assertEqual(Token.objects.count(), 2)
+
+
+class SessionNumberTests(TestCase):
+    """with_session_number() agrees with get_session_number()"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='dm', password='pw')
+        self.campaigns = [Campaign.objects.create(user=user, name=name) for name in ('One', 'Two')]
+        start = timezone.now()
+        # Interleave the campaigns' sessions, with distinct creation times
+        for i in range(6):
+            session = RecordingSession.objects.create(campaign=self.campaigns[i % 2])
+            RecordingSession.objects.filter(pk=session.pk).update(created_at=start + timedelta(minutes=i))
+
+    def test_annotation_matches_counted_number(self):
+        annotated = {session.pk: session.session_number for session in RecordingSession.objects.with_session_number()}
+        self.assertEqual(len(annotated), 6)
+        for session in RecordingSession.objects.all():
+            self.assertEqual(annotated[session.pk], session.get_session_number())
+
+    def test_numbers_are_per_campaign(self):
+        for campaign in self.campaigns:
+            sessions = RecordingSession.objects.filter(campaign=campaign).with_session_number()
+            self.assertEqual([session.session_number for session in sessions], [1, 2, 3])
+
+    def test_get_session_number_uses_annotation(self):
+        session = RecordingSession.objects.with_session_number().last()
+        with self.assertNumQueries(0):
+            self.assertEqual(session.get_session_number(), 3)
+
+
+class TranscriptionFullTextTests(TestCase):
+    """Transcription.save keeps full_text_cached in step with the words"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='dm', password='pw')
+        campaign = Campaign.objects.create(user=user, name='Campaign')
+        self.session = RecordingSession.objects.create(campaign=campaign)
+
+    def create_transcription(self, **kwargs):
+        return Transcription.objects.create(session=self.session, chunk_number=1, **kwargs)
+
+    def test_create_stores_full_text(self):
+        transcription = self.create_transcription(text='raw', words_json=WORDS)
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.full_text_cached, 'Roll initiative (dice rolling)')
+        self.assertEqual(transcription.full_text, transcription.build_full_text())
+
+    def test_falls_back_to_text_without_words(self):
+        transcription = self.create_transcription(text='Just the text')
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.full_text_cached, 'Just the text')
+
+    def test_full_save_rebuilds_full_text(self):
+        transcription = self.create_transcription(text='raw', words_json=WORDS)
+        transcription.words_json = WORDS[:1]
+        transcription.save()
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.full_text_cached, 'Roll')
+
+    def test_update_fields_with_words_rebuilds_full_text(self):
+        transcription = self.create_transcription(text='raw', words_json=WORDS)
+        transcription.words_json = WORDS[1:]
+        transcription.save(update_fields=['words_json'])
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.full_text_cached, 'initiative (dice rolling)')
+
+    def test_update_fields_with_text_rebuilds_full_text(self):
+        transcription = self.create_transcription(text='before')
+        transcription.text = 'after'
+        transcription.save(update_fields=['text'])
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.full_text_cached, 'after')
+
+    def test_update_fields_without_words_leaves_full_text(self):
+        transcription = self.create_transcription(text='raw', words_json=WORDS)
+        # Stale in memory only; saving another field must not write it
+        transcription.full_text_cached = 'stale'
+        transcription.generated_insight_text = 'Insight'
+        transcription.save(update_fields=['generated_insight_text'])
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.generated_insight_text, 'Insight')
+        self.assertEqual(transcription.full_text_cached, 'Roll initiative (dice rolling)')
+
+
+class AgentRunnerTests(SimpleTestCase):
+    """One shared summary agent; agent runs reuse a per-thread event loop"""
+
+    def loop_in_new_thread(self):
+        loops = []
+        thread = Thread(target=lambda: loops.append(views.get_agent_loop()))
+        thread.start()
+        thread.join()
+        self.addCleanup(loops[0].close)
+        return loops[0]
+
+    def test_summary_agent_is_built_once(self):
+        with mock.patch.object(views, '_summary_agent', None), \
+                mock.patch.object(views, '_build_summary_agent', side_effect=object) as build:
+            agent = views.get_summary_agent()
+            self.assertIs(views.get_summary_agent(), agent)
+        build.assert_called_once_with()
+
+    def test_loop_is_reused_within_a_thread(self):
+        loop = views.get_agent_loop()
+        self.assertIs(views.get_agent_loop(), loop)
+        self.assertFalse(loop.is_closed())
+
+    def test_threads_get_their_own_loop(self):
+        self.assertIsNot(self.loop_in_new_thread(), views.get_agent_loop())
+
+    def test_closed_loop_is_replaced(self):
+        loop = views.get_agent_loop()
+        loop.close()
+        replacement = views.get_agent_loop()
+        self.assertIsNot(replacement, loop)
+        self.assertFalse(replacement.is_closed())
+
+    def test_run_agent_runs_on_the_thread_loop(self):
+        async def run(agent, prompt):
+            return agent, prompt, asyncio.get_running_loop()
+
+        with mock.patch.object(views.Runner, 'run', side_effect=run):
+            first = views.run_agent('agent', 'prompt')
+            second = views.run_agent('agent', 'other prompt')
+        self.assertEqual(first[:2], ('agent', 'prompt'))
+        self.assertIs(first[2], views.get_agent_loop())
+        self.assertIs(second[2], first[2])
@@ -1,24 +1,30 @@
+import io
 import json
 import os
+import contextlib
 import tempfile
 import time
 import asyncio
-from threading import Thread
+from threading import Lock, Thread, local
 from django.utils import timezone
 from django.conf import settings
 from django.http import JsonResponse
+from django.db.models import Count, Prefetch
+from django.db.models.functions import Coalesce
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from elevenlabs import ElevenLabs
-from openai import OpenAI
 from agents import Agent, Runner, WebSearchTool
 from agents.items import ToolCallItem, ToolCallOutputItem # Import specific item types
 import requests
 
 # Import documents tools instead of FileSearchTool
 from documents.tools import get_agent_tools
+from documents.openai_client import get_openai_client
+from documents.services import DocumentService
+from documents.serializers import DocumentSerializer
 
 # Import pydub for audio conversion
 try:
@@ -53,12 +59,31 @@ if not os.environ.get("OPENAI_API_KEY"):
     print("OPENAI_API_KEY is not set")
     exit()
 
+# Clients reused across audio chunks (keeps their connection pools alive)
+TRANSCRIPTION_TIMEOUT = 120.0
+_elevenlabs_client = None
+
+def get_elevenlabs_client():
+    """Get or initialize the shared ElevenLabs client"""
+    global _elevenlabs_client
+    if _elevenlabs_client is None:
+        _elevenlabs_client = ElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
+    return _elevenlabs_client
+
 # Global variables - Removed recording state vars
 current_session = None # Kept for insight generation context
 SUMMARY_INTERVAL = 20 # Interval still relevant for automated insights
 last_summary_time = 0 # Keep track of summary timing
 
-def get_summary_agent():
+# The agent's configuration never changes, so one instance is shared. Each
+# thread keeps its own event loop for agent runs, reused across calls instead
+# of a new loop per call; runs on different threads (and their sync tools)
+# don't wait on each other.
+_summary_agent = None
+_agent_lock = Lock()
+_agent_loops = local()
+
+def _build_summary_agent():
     # Get custom tools from documents app
     custom_tool_definitions = get_agent_tools()
     
@@ -87,6 +112,27 @@ def get_summary_agent():
         tool_configs=tool_configs
     )
 
+def get_summary_agent():
+    """Get or build the shared summary agent"""
+    global _summary_agent
+    if _summary_agent is None:
+        with _agent_lock:
+            if _summary_agent is None:
+                _summary_agent = _build_summary_agent()
+    return _summary_agent
+
+def get_agent_loop():
+    """Get this thread's event loop for agent runs, creating it on first use"""
+    loop = getattr(_agent_loops, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _agent_loops.loop = loop
+    return loop
+
+def run_agent(agent, prompt):
+    """Run an agent on this thread's event loop and wait for its result"""
+    return get_agent_loop().run_until_complete(Runner.run(agent, prompt))
+
 
 # Helper function to print run items for debugging
 def print_run_items(result):
@@ -151,7 +197,7 @@ def summarize_latest_transcriptions(triggering_transcription_id, is_forced=False
         for t in latest_transcriptions
     ])
 
-    # Create the summary agent and run it
+    # Get the shared summary agent and run it
     agent = get_summary_agent()
 
     # Choose prompt based on whether it was forced
@@ -164,13 +210,9 @@ def summarize_latest_transcriptions(triggering_transcription_id, is_forced=False
 
     print(prompt)
 
-    # Set up a new event loop for this thread
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     try:
-        # Run the agent synchronously
-        result = Runner.run_sync(agent, prompt)
+        # Run the agent on the shared loop and wait for it
+        result = run_agent(agent, prompt)
 
         # Print run items for debugging
         print_run_items(result)
@@ -194,14 +236,18 @@ def summarize_latest_transcriptions(triggering_transcription_id, is_forced=False
     except Exception as e:
         print(f"Error running summary agent: {e}")
         return None # Ensure None is returned on agent error
-    finally:
-        # Clean up the loop
-        loop.close()
 
 
 # Removed start_recording function
 
 
+# TranscriptionSerializer fields returned by latest_transcriptions?light=1
+LIGHT_TRANSCRIPTION_FIELDS = (
+    'id', 'session', 'created_at', 'text', 'chunk_number', 'language_code',
+    'language_probability', 'generated_insight_text',
+)
+
+
 # API Viewsets
 class CampaignViewSet(viewsets.ModelViewSet):
     """
@@ -221,9 +267,28 @@ class CampaignViewSet(viewsets.ModelViewSet):
         for the currently authenticated user.
         """
         user = self.request.user
-        if user.is_authenticated:
-            return Campaign.objects.filter(user=user).prefetch_related('sessions')
-        return Campaign.objects.none()
+        if not user.is_authenticated:
+            return Campaign.objects.none()
+        
+        # Count sessions and documents in the same query (distinct, since
+        # both joins multiply the rows)
+        queryset = Campaign.objects.filter(user=user).annotate(
+            session_count=Count('sessions', distinct=True),
+            document_count=Count('documents', distinct=True),
+        )
+        if self.action == 'list':
+            # CampaignListSerializer doesn't include the sessions
+            return queryset
+        
+        # Prefetch the nested sessions and their transcriptions in one query
+        # each. Sessions are prefetched per whole campaign, so they can be
+        # numbered by the database in the same query.
+        return queryset.prefetch_related(
+            Prefetch(
+                'sessions',
+                queryset=RecordingSession.objects.with_session_number().prefetch_related('transcriptions')
+            )
+        )
 
     def perform_create(self, serializer):
         """
@@ -254,6 +319,9 @@ class CampaignViewSet(viewsets.ModelViewSet):
         """
         Upload a document associated with this campaign.
         
+        Returns 202 once the document is stored; processing and indexing
+        continue in the background (poll the document's status).
+        
         Expects multipart/form-data with:
         - file: The document file
         - title: Document title
@@ -279,8 +347,6 @@ class CampaignViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Document title is required.'},
                             status=status.HTTP_400_BAD_REQUEST)
         
-        from documents.services import DocumentService
-        
         try:
             # Create the document with campaign association
             document = DocumentService.upload_document(
@@ -291,9 +357,8 @@ class CampaignViewSet(viewsets.ModelViewSet):
                 campaign=campaign
             )
             
-            from documents.serializers import DocumentSerializer
             serializer = DocumentSerializer(document)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         
         except Exception as e:
             return Response({'error': f'Error uploading document: {str(e)}'},
@@ -374,12 +439,22 @@ class RecordingSessionViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return RecordingSession.objects.none()
         
-        queryset = RecordingSession.objects.filter(campaign__user=user).select_related('campaign').prefetch_related('transcriptions')
+        queryset = RecordingSession.objects.filter(campaign__user=user).select_related('campaign')
+        # Only the standard actions render sessions with all their
+        # transcriptions; the custom ones (upload_chunk, latest_insight, ...)
+        # just need the session row
+        if self.action in ('list', 'retrieve', 'update', 'partial_update'):
+            queryset = queryset.prefetch_related('transcriptions')
         
         # Check for both campaign_id and campaign parameters for backward compatibility
         campaign_id = self.request.query_params.get('campaign_id', None) or self.request.query_params.get('campaign', None)
         if campaign_id:
             queryset = queryset.filter(campaign_id=campaign_id)
+        
+        # Lists only filter on whole campaigns, so the database can number the
+        # sessions; single-session lookups fall back to one COUNT
+        if self.action == 'list':
+            queryset = queryset.with_session_number()
             
         return queryset
 
@@ -397,55 +472,72 @@ class RecordingSessionViewSet(viewsets.ModelViewSet):
         audio_file = request.FILES['audio_chunk']
 
         # Determine the next chunk number sequentially for this session
-        last_chunk = Transcription.objects.filter(session=session).order_by('-chunk_number').first()
-        current_chunk_number = (last_chunk.chunk_number + 1) if last_chunk else 0
+        # (only the number is read, not the last chunk's text and words)
+        last_chunk_number = Transcription.objects.filter(session=session).order_by('-chunk_number').values_list('chunk_number', flat=True).first()
+        current_chunk_number = (last_chunk_number + 1) if last_chunk_number is not None else 0
 
         # Save the uploaded chunk temporarily (use original extension if possible)
         original_filename = audio_file.name
         _, original_ext = os.path.splitext(original_filename)
+        uploaded_to_disk = hasattr(audio_file, 'temporary_file_path') and bool(original_ext)
         if not original_ext: # Default to .webm if no extension found
             original_ext = '.webm'
 
         temp_file_path = None
-        converted_file_path = None
+        converted_audio = None
 
         try:
-            # Save the original uploaded file
-            with tempfile.NamedTemporaryFile(suffix=original_ext, delete=False) as temp_file:
-                for chunk_content in audio_file.chunks():
-                    temp_file.write(chunk_content)
-                temp_file_path = temp_file.name
-                print(f"Saved original chunk {current_chunk_number} to {temp_file_path}")
+            if uploaded_to_disk:
+                # Django already spooled the upload to a temp file (keeping its
+                # extension); use it in place instead of copying it again.
+                # Django deletes it when the request finishes.
+                temp_file_path = audio_file.temporary_file_path()
+                print(f"Using uploaded chunk {current_chunk_number} at {temp_file_path}")
+            else:
+                # Save the original uploaded file
+                with tempfile.NamedTemporaryFile(suffix=original_ext, delete=False) as temp_file:
+                    for chunk_content in audio_file.chunks():
+                        temp_file.write(chunk_content)
+                    temp_file_path = temp_file.name
+                    print(f"Saved original chunk {current_chunk_number} to {temp_file_path}")
 
             # Attempt conversion to WAV if pydub is available
             if AudioSegment and ffmpeg_check:
                 print(f"Attempting to convert {temp_file_path} to WAV...")
                 try:
                     audio = AudioSegment.from_file(temp_file_path) # Let pydub detect format
-                    # Create a new temporary file for the WAV version
-                    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as converted_file:
-                        audio.export(converted_file.name, format="wav")
-                        converted_file_path = converted_file.name
-                    print(f"Successfully converted chunk {current_chunk_number} to {converted_file_path}")
-                    # Use the converted file path for transcription
-                    transcription_input_path = converted_file_path
+                    # Keep the WAV in memory and upload it from there, instead
+                    # of writing it to another temp file and reading it back
+                    converted_audio = io.BytesIO()
+                    audio.export(converted_audio, format="wav")
+                    # The clients take the upload's filename (and format) from .name
+                    converted_audio.name = f"chunk_{current_chunk_number}.wav"
+                    print(f"Successfully converted chunk {current_chunk_number} to WAV in memory")
                 except Exception as conversion_error:
                     print(f"WARNING: Failed to convert {temp_file_path} to WAV: {conversion_error}. Attempting transcription with original file.")
                     # Fallback to original file if conversion fails
-                    transcription_input_path = temp_file_path
+                    converted_audio = None
             else:
                 print(f"Skipping audio conversion for chunk {current_chunk_number}. Using original file: {temp_file_path}")
-                transcription_input_path = temp_file_path
+
+            transcription_input_path = temp_file_path if converted_audio is None else converted_audio.name
+
+            def open_transcription_input():
+                if converted_audio is not None:
+                    converted_audio.seek(0)
+                    return contextlib.nullcontext(converted_audio)
+                return open(temp_file_path, 'rb')
 
             # --- Transcription Logic --- (Now uses transcription_input_path)
             if settings.TRANSCRIPTION_MODEL == 'openai':
                 print(f"Using OpenAI Whisper ({transcription_input_path}) for chunk {current_chunk_number}...")
-                openai_client = OpenAI()
-                with open(transcription_input_path, 'rb') as audio_input:
+                openai_client = get_openai_client()
+                with open_transcription_input() as audio_input:
                     response = openai_client.audio.transcriptions.create(
                         model="whisper-1",
                         file=audio_input,
-                        response_format="verbose_json"
+                        response_format="verbose_json",
+                        timeout=TRANSCRIPTION_TIMEOUT
                     )
                     transcription_text = response.text
                     language_code = response.language
@@ -459,8 +551,8 @@ class RecordingSessionViewSet(viewsets.ModelViewSet):
 
             elif settings.TRANSCRIPTION_MODEL == 'elevenlabs':
                 print(f"Using ElevenLabs ({transcription_input_path}) for chunk {current_chunk_number}...")
-                elevenlabs_client = ElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
-                with open(transcription_input_path, 'rb') as audio_input:
+                elevenlabs_client = get_elevenlabs_client()
+                with open_transcription_input() as audio_input:
                     response = elevenlabs_client.speech_to_text.convert(
                         file=audio_input,
                         model_id="scribe_v1",
@@ -513,26 +605,26 @@ class RecordingSessionViewSet(viewsets.ModelViewSet):
             # Return error response
             return Response({'error': f'Failed to process audio chunk: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         finally:
-            # Clean up both temporary files if they exist
-            if temp_file_path and os.path.exists(temp_file_path):
+            # Clean up the temporary file if we made one (Django owns the spooled upload)
+            if temp_file_path and not uploaded_to_disk and os.path.exists(temp_file_path):
                 try:
                     os.unlink(temp_file_path)
                     print(f"Original temporary file {temp_file_path} deleted.")
                 except Exception as unlink_error:
                     print(f"Error deleting original temporary file {temp_file_path}: {unlink_error}")
-            if converted_file_path and os.path.exists(converted_file_path):
-                 try:
-                    os.unlink(converted_file_path)
-                    print(f"Converted temporary file {converted_file_path} deleted.")
-                 except Exception as unlink_error:
-                    print(f"Error deleting converted temporary file {converted_file_path}: {unlink_error}")
 
     @action(detail=True, methods=['get'])
     def latest_transcriptions(self, request, pk=None):
         session = self.get_object()
         # Get the latest 5 transcriptions
-        latest_transcriptions = Transcription.objects.filter(session=session).order_by('-created_at')[:5]
-        serializer = TranscriptionSerializer(latest_transcriptions, many=True)
+        latest_transcriptions = Transcription.objects.filter(session=session).order_by('-created_at')
+        if request.query_params.get('light', '').lower() in ('1', 'true'):
+            # Skip reading and decoding words_json; full_text is read from
+            # the stored column
+            return Response(list(latest_transcriptions.values(
+                *LIGHT_TRANSCRIPTION_FIELDS, full_text=Coalesce('full_text_cached', 'text')
+            )[:5]))
+        serializer = TranscriptionSerializer(latest_transcriptions[:5], many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
@@ -586,19 +678,15 @@ class RecordingSessionViewSet(viewsets.ModelViewSet):
         if not question:
             return Response({'error': 'Question is required'}, status=status.HTTP_400_BAD_REQUEST)
             
-        # Create the summary agent
+        # Get the shared agent
         agent = get_summary_agent()
         
         # Create a prompt for the rules question using the prompt module
         prompt = get_rules_question_prompt(question)
         
-        # Set up a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
         try:
-            # Run the agent synchronously
-            result = Runner.run_sync(agent, prompt)
+            # Run the agent on the shared loop and wait for it
+            result = run_agent(agent, prompt)
             
             print(result.raw_responses)
             
@@ -609,9 +697,6 @@ class RecordingSessionViewSet(viewsets.ModelViewSet):
         except Exception as e:
             print(f"Error running agent for rules question: {e}")
             return Response({'error': f'Failed to answer question: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            # Clean up the loop
-            loop.close()
 
 class TranscriptionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Transcription.objects.all()
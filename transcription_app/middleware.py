@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.http import JsonResponse
+
+
+class MaxUploadSizeMiddleware:
+    """
+    Reject POST requests whose Content-Length exceeds MAX_UPLOAD_SIZE
+    before Django reads (and spools) the body
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = settings.MAX_UPLOAD_SIZE
+
+    def __call__(self, request):
+        if request.method == 'POST':
+            try:
+                content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                content_length = 0
+            if content_length > self.limit:
+                return JsonResponse(
+                    {"error": f"File too large. Maximum upload size is {self.limit // (1024 * 1024)} MB"},
+                    status=413
+                )
+        return self.get_response(request)
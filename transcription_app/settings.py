@@ -58,6 +58,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # CORS middleware
+    # Reject oversized uploads early; after CORS so the 413 carries CORS headers
+    "transcription_app.middleware.MaxUploadSizeMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -94,10 +96,33 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections open between requests so short endpoints (auth,
+        # status polling) don't pay for a new connection and its PRAGMAs each time
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 300)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
 
+# Cache
+# Used for query embeddings; set REDIS_URL to share the cache between workers
+
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -146,6 +171,34 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# When set (e.g. '/protected_media/'), document downloads are handed off to nginx
+# via X-Accel-Redirect instead of being streamed through the Django worker
+DOCUMENTS_X_ACCEL_REDIRECT_PREFIX = os.getenv('DOCUMENTS_X_ACCEL_REDIRECT_PREFIX')
+
+# Load the local embedding model (and run one encode) when a server process
+# starts, instead of on the first document processed. Off by default so
+# management commands don't pay for it.
+DOCUMENTS_WARM_EMBEDDING_MODEL = os.getenv('DOCUMENTS_WARM_EMBEDDING_MODEL', 'False').lower() in ('true', '1', 't')
+
+# Compute local (MiniLM) embeddings for document chunks on ingest. They're
+# only used by the local search in documents/views.py, so leave this off
+# unless that view is routed.
+DOCUMENTS_LOCAL_SEARCH_EMBEDDINGS = os.getenv('DOCUMENTS_LOCAL_SEARCH_EMBEDDINGS', 'False').lower() in ('true', '1', 't')
+
+# Open the ChromaDB client and collection when a server process starts rather
+# than on the first search. Off by default for the same reason.
+DOCUMENTS_INIT_VECTOR_STORE = os.getenv('DOCUMENTS_INIT_VECTOR_STORE', 'False').lower() in ('true', '1', 't')
+
+# Uploads: POST bodies larger than MAX_UPLOAD_SIZE are rejected with 413 before
+# being read. Uploaded files always stream to a temp file on disk, so they are
+# never held in memory and can be read from that path directly.
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 50 * 1024 * 1024))
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5 MB (only used by the in-memory handler)
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -168,8 +221,14 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # JSONRenderer output, encoded with orjson when it's installed
+        'documents.renderers.ORJSONRenderer',
     ],
+    # Rates for the throttles applied to the documents API
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '60/min',
+        'upload': '10/hour',
+    },
 }
 
 # CORS settings